@@ -0,0 +1,148 @@
+"""
+Benchmark du pré-traitement HTML des étapes : anciennes passes regex contre le flux de jetons.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_guide_processor [dossier_guides] [nb_etapes]
+
+Les étapes les plus longues de la bibliothèque sont traitées par les deux implémentations ;
+les sorties doivent être identiques. Des cas synthétiques montrent en plus le retour
+arrière des regex non-gourmandes (mot "Zaap" répété sans span bleu).
+"""
+import os
+import re
+import sys
+import timeit
+
+from PyQt6.QtCore import QUrl
+
+from interface.panels.guide_processor import GuideProcessor
+from scripts.parser_features import ParserScripts
+
+ZAAP_SHORTCUT = re.compile(r'(Zaap.*?<span[^>]*style="color:\s*rgb\(98,\s*172,\s*255\);?"[^>]*>.*?</span>)',
+                           re.IGNORECASE | re.DOTALL)
+
+
+def legacy_preprocess(html, current_guide_id, current_step_id, checkbox_states, image_path_callback):
+    """Copie de l'ancienne implémentation (six re.sub successifs) servant de référence."""
+    counter = [0]
+    html = ZAAP_SHORTCUT.sub(r'<span class="zaap-shortcut" data-type="zaap-shortcut">\1</span>', html)
+    html = re.sub(r'\[\s*(-?\d+)\s*,\s*(-?\d+)\s*\]',
+                  lambda m: (f'<span style="color: #4da6ff; cursor: pointer; font-weight: bold;" '
+                             f'onclick="onLinkClick(\'TRAVEL:{m.group(1)},{m.group(2)}\')">'
+                             f'[{m.group(1)},{m.group(2)}]</span>'), html)
+
+    def guide_replacer(match):
+        attrs, content = match.group(1), match.group(2)
+        gid_match = re.search(r'guideid="(\d+)"', attrs)
+        step_match = re.search(r'stepnumber="(\d+)"', attrs)
+        name_match = re.search(r'guidename="([^"]+)"', attrs)
+        gid = gid_match.group(1) if gid_match else "0"
+        step = step_match.group(1) if step_match else None
+        gname = name_match.group(1) if name_match else "Guide"
+        link_action = f"GUIDE:{gid}"
+        if step and (gid == "0" or str(gid) == str(current_guide_id)):
+            link_action = f"STEP:{step}"
+        link_action = link_action.replace("'", "\\'")
+        return (f'<span class="guide-step" data-tooltip="{gname}" '
+                f'onclick="onLinkClick(\'{link_action}\')">{content}</span>')
+
+    html = re.sub(r'(<span[^>]*class="[^"]*guide-step[^"]*"[^>]*>)(.*?)</span>', guide_replacer, html,
+                  flags=re.DOTALL)
+    html = re.sub(r'<img src="([^"]+)"',
+                  lambda m: (f'<img src="{QUrl.fromLocalFile(image_path_callback(m.group(1))).toString()}" '
+                             f'data-original-src="{m.group(1)}"'), html)
+
+    def quest_block_replacer(match):
+        full_div = match.group(0)
+        title_match = re.search(r'title="([^"]+)"', full_div)
+        title = title_match.group(1) if title_match else "Détails"
+        content_match = re.search(r'<div[^>]*class="quest-block"[^>]*>(.*?)</div>', full_div, flags=re.DOTALL)
+        content = content_match.group(1) if content_match else ""
+        content = re.sub(r'^\s*<p>\s*<span[^>]*class="[^"]*tag-[^"]*"[^>]*>.*?</span>\s*:?\s*</p>', '', content,
+                         flags=re.IGNORECASE | re.DOTALL)
+        return f'<div class="quest-block" data-tooltip="{title}"><div>{content}</div></div>'
+
+    html = re.sub(r'(<div[^>]*class="quest-block"[^>]*>.*?</div>)', quest_block_replacer, html, flags=re.DOTALL)
+
+    def checkbox_replacer(match):
+        counter[0] += 1
+        unique_key = f"{current_step_id}_{counter[0]}"
+        checked_attr = "checked" if checkbox_states.get(unique_key, False) else ""
+        return (f'<div class="checkbox-row">'
+                f'<input type="checkbox" {checked_attr} onclick="onCheckboxClick(\'{unique_key}\', this.checked)">'
+                f'<span class="cb-text">{match.group(2).strip()}</span></div>')
+
+    return re.sub(r'(<input[^>]*type="checkbox"[^>]*>)(.*?)(?=<br>|<\/p>|<\/div>|<\/li>|$)',
+                  checkbox_replacer, html, flags=re.IGNORECASE | re.DOTALL)
+
+
+SYNTHETIC_STEPS = [
+    ("zaap sans span bleu", '<p>Prenez le zaap puis marchez vers [3,-2]</p>' * 300),
+    ("zaap, span bleu à la fin", '<p>Zaap le plus proche</p>' * 500 + '<span style="color: rgb(98, 172, 255);">Astrub'),
+]
+
+
+def largest_steps(folder, count):
+    steps = []
+    parser_script = ParserScripts()
+    for path in parser_script.list_library(folder):
+        data = parser_script.load_file(path) or {}
+        for step in data.get("steps", []):
+            html = step.get("web_text") or ""
+            if html:
+                steps.append((len(html), data.get("id"), step.get("id"), html))
+    steps.sort(key=lambda s: s[0], reverse=True)
+    return steps[:count]
+
+
+def compare(label, html, guide_id, step_id, processor, image_path):
+    """Vérifie l'égalité des sorties puis chronomètre les deux implémentations. None si différentes."""
+    args = (html, guide_id, step_id, {}, image_path)
+    # L'ancienne version convertissait elle-même le chemin en URL file:///
+    new_args = (html, guide_id, step_id, {}, lambda url, variant: QUrl.fromLocalFile(image_path(url)).toString())
+    if processor.preprocess_content(*new_args) != legacy_preprocess(*args):
+        print(f"❌ Sortie différente ({label})")
+        return None
+
+    number = max(1, 20000 // max(1, len(html) // 100))
+    old = min(timeit.repeat(lambda: legacy_preprocess(*args), number=number, repeat=3)) / number
+    new = min(timeit.repeat(lambda: processor.preprocess_content(*new_args), number=number, repeat=3)) / number
+    print(f"{label:>24} {len(html):>8} {old * 1000:>11.3f} {new * 1000:>12.3f} {old / new:>5.1f}x")
+    return old, new
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "guides"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    if not os.path.isdir(folder):
+        print(f"Dossier introuvable : {folder}")
+        return 1
+
+    steps = largest_steps(folder, count)
+    if not steps:
+        print("Aucune étape trouvée.")
+        return 1
+
+    processor = GuideProcessor()
+    image_path = lambda url: os.path.join("cache", "images", os.path.basename(url))
+
+    header = f"{'étape':>24} {'taille':>8} {'regex (ms)':>11} {'jetons (ms)':>12} {'gain':>6}"
+    print(header)
+    total_old = total_new = 0.0
+    for _, guide_id, step_id, html in steps:
+        timing = compare(f"{guide_id}/{step_id}", html, guide_id, step_id, processor, image_path)
+        if timing is None:
+            return 1
+        total_old += timing[0]
+        total_new += timing[1]
+    print(f"\nTotal : {total_old * 1000:.2f} ms -> {total_new * 1000:.2f} ms ({total_old / total_new:.1f}x)\n")
+
+    print(header)
+    for label, html in SYNTHETIC_STEPS:
+        if compare(label, html, 1, 1, processor, image_path) is None:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
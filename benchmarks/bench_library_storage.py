@@ -0,0 +1,83 @@
+"""
+Benchmark du stockage de la bibliothèque : JSON indenté (ancien format) contre JSON compact gzip.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_library_storage [dossier_guides] [nb_repetitions]
+
+Chaque guide de la bibliothèque est réécrit dans les deux formats dans un dossier temporaire,
+puis relu en entier par ParserScripts.load_file (lecture + décompression + décodage JSON).
+Les lectures se font fichiers déjà dans le cache de l'OS : le gain réel sur disque froid est plus grand.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from scripts.parser_features import ParserScripts, LIBRARY_EXT, LEGACY_EXT, guide_stem
+
+
+def write_all(parser_script, guides, folder, ext):
+    paths = []
+    start = time.perf_counter()
+    for stem, data in guides:
+        path = os.path.join(folder, f"{stem}{ext}")
+        if not parser_script.save_file(path, data):
+            raise OSError(f"Écriture impossible : {path}")
+        paths.append(path)
+    return paths, time.perf_counter() - start
+
+
+def load_all(parser_script, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            parser_script.load_file(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "guides"
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    if not os.path.isdir(folder):
+        print(f"Dossier introuvable : {folder}")
+        return 1
+
+    parser_script = ParserScripts()
+    guides = []
+    for path in parser_script.list_library(folder):
+        data = parser_script.load_file(path)
+        if data:
+            guides.append((guide_stem(path), data))
+    if not guides:
+        print("Aucun guide trouvé.")
+        return 1
+
+    tmp = tempfile.mkdtemp(prefix="bench_library_")
+    try:
+        results = []
+        for label, ext in (("json indenté", LEGACY_EXT), ("json.gz compact", LIBRARY_EXT)):
+            paths, write_time = write_all(parser_script, guides, tmp, ext)
+            for (_, data), path in zip(guides, paths):
+                if parser_script.load_file(path) != data:
+                    print(f"❌ Relecture différente ({path})")
+                    return 1
+            size = sum(os.path.getsize(path) for path in paths)
+            results.append((label, size, write_time, load_all(parser_script, paths, repeat)))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{len(guides)} guide(s), meilleure lecture complète sur {repeat} essai(s)\n")
+    print(f"{'format':>16} {'disque (Ko)':>12} {'ratio':>6} {'écriture (ms)':>14} {'lecture (ms)':>13} {'ms/guide':>9}")
+    base_size = results[0][1]
+    for label, size, write_time, load_time in results:
+        print(f"{label:>16} {size / 1024:>12.0f} {base_size / size:>5.1f}x {write_time * 1000:>14.1f} "
+              f"{load_time * 1000:>13.1f} {load_time * 1000 / len(guides):>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
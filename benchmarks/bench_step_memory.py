@@ -0,0 +1,119 @@
+"""
+Benchmark de la mémoire des onglets ouverts : étapes en dicts JSON complets contre Step compactes.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_step_memory [dossier_guides] [nb_onglets]
+
+Les plus gros guides de la bibliothèque sont ouverts comme par SessionFeatures.add_guide
+(étapes + table d'actions) ; sans bibliothèque, des guides synthétiques sont générés.
+La mémoire est mesurée par tracemalloc : le store binaire, lu via mmap, n'y apparaît pas
+(ses pages appartiennent au cache de l'OS), seules les structures Python sont comptées.
+"""
+import gc
+import os
+import json
+import sys
+import random
+import tracemalloc
+
+from scripts.parser_features import ParserScripts
+from scripts.guide_compiler import GuideCompiler
+from scripts.step_model import compact_steps
+
+SYNTHETIC_STEPS = 1500
+
+
+def synthetic_guide(gid, steps):
+    """Guide imitant un export Ganymede : HTML de taille variable et champs non lus par l'application."""
+    rng = random.Random(gid)
+    words = ["Parler", "au", "PNJ", "Zaap", "Astrub", "récupérer", "ressource", "quête", "donjon", "Bonta"]
+    data = {"id": gid, "name": f"Guide synthétique {gid}", "steps": []}
+    for i in range(steps):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(5, 400)))
+        data["steps"].append({
+            "id": gid * 10000 + i, "order": i, "pos_x": rng.randint(-80, 80), "pos_y": rng.randint(-80, 80),
+            "map_id": rng.randint(1, 10 ** 9), "sub_area": rng.choice(words), "is_checked": False,
+            "web_text": f"<p>{text} [{rng.randint(-80, 80)},{rng.randint(-80, 80)}]</p>",
+            "text": text,
+        })
+    return data
+
+
+def load_guides(parser_script, folder, count):
+    guides = []
+    for path in parser_script.list_library(folder) if os.path.isdir(folder) else []:
+        data = parser_script.load_file(path)
+        if data and parser_script.get_steps_list(data):
+            guides.append(data)
+    guides.sort(key=lambda data: len(data["steps"]), reverse=True)
+    guides = guides[:count]
+    while len(guides) < count:
+        guides.append(synthetic_guide(100000 + len(guides), SYNTHETIC_STEPS))
+    return guides
+
+
+def measure(open_tabs):
+    """Octets alloués (et pic) pour construire les onglets, données sources comprises."""
+    gc.collect()
+    tracemalloc.start()
+    tabs = open_tabs()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tabs, current, peak
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else "guides"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    parser_script = ParserScripts()
+    compiler = GuideCompiler(parser_script)
+    sources = load_guides(parser_script, folder, count)
+    # Sources sérialisées : chaque mesure décode sa propre copie, comme au chargement réel
+    blobs = [json.dumps(data) for data in sources]
+    del sources
+
+    def open_dicts():
+        tabs = []
+        for blob in blobs:
+            steps = json.loads(blob)["steps"]
+            tabs.append({"steps": steps, "actions": compiler.compile_steps(steps)})
+        return tabs
+
+    def open_compact():
+        tabs = []
+        for blob in blobs:
+            steps = compact_steps(json.loads(blob)["steps"])
+            tabs.append({"steps": steps, "actions": compiler.compile_steps(steps)})
+        return tabs
+
+    results = []
+    for label, open_tabs in (("dict JSON", open_dicts), ("Step compacte", open_compact)):
+        tabs, current, peak = measure(open_tabs)
+        results.append((label, tabs, current, peak))
+
+    reference, compact = results[0][1], results[1][1]
+    for old, new in zip(reference, compact):
+        for a, b in zip(old["steps"], new["steps"]):
+            if (parser_script.get_step_web_text(a) != parser_script.get_step_web_text(b)
+                    or parser_script.get_step_coords(a) != parser_script.get_step_coords(b)
+                    or a.get("id") != b.get("id")):
+                print("❌ Étape compacte différente de l'original")
+                return 1
+        if old["actions"] != new["actions"]:
+            print("❌ Table d'actions différente")
+            return 1
+
+    total_steps = sum(len(tab["steps"]) for tab in reference)
+    print(f"{len(reference)} onglet(s), {total_steps} étapes\n")
+    print(f"{'format':>14} {'résident (Mo)':>14} {'pic (Mo)':>9} {'o/étape':>8} {'ratio':>6}")
+    base = results[0][2]
+    for label, _, current, peak in results:
+        print(f"{label:>14} {current / 2 ** 20:>14.1f} {peak / 2 ** 20:>9.1f} "
+              f"{current / total_steps:>8.0f} {base / current:>5.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 import threading
 import time
 import os
-import re
 import logging
 from PyQt6.QtWidgets import QFileDialog, QApplication
 from PyQt6.QtCore import QTimer, QObject, pyqtSignal
@@ -11,15 +10,30 @@ from scripts.mouse_features import MouseScripts
 from scripts.system_features import SystemScripts
 from scripts.keyboard_features import KeyboardScripts
 from scripts.window_features import WindowScripts
-from scripts.parser_features import ParserScripts
-from scripts.network_features import NetworkFeatures
+from scripts.parser_features import ParserScripts, LIBRARY_EXT
+from scripts.network_features import NetworkFeatures, GuideDownloadError
 from scripts.session_features import SessionFeatures
 from scripts.ocr_features import OcrScripts
 from scripts.overlay_features import OverlayScripts
 from scripts.snipping_tool import SnippingTool
+from scripts.search_features import SearchIndex
+from scripts.download_features import shared_scheduler
+from scripts.asset_cache import shared_asset_cache
+from scripts.warmup_features import AssetWarmup
+from scripts.crawler_features import GuideCrawler
+from scripts.sync_features import LibrarySync
+from scripts.pack_features import open_pack
+from scripts.step_store import GrowingSteps
 
 logger = logging.getLogger(__name__)
 
+# Délai minimal entre deux revalidations réseau d'un même guide local (secondes)
+GUIDE_REVALIDATE_INTERVAL = 300
+# Profondeur de suivi des liens GUIDE: pour le préchargement des guides cités (0 : désactivé)
+GUIDE_PREFETCH_DEPTH = 1
+# Mémoire max des étapes gardées pour les onglets inactifs ; au-delà, les plus anciens sont déchargés
+GUIDE_MEMORY_BUDGET_MB = 64
+
 
 class MainController(QObject):
     """
@@ -27,11 +41,14 @@ class MainController(QObject):
     """
 
     # --- DÉFINITION DES SIGNAUX ---
-    sig_open_guide = pyqtSignal(dict, str)
+    sig_open_guide = pyqtSignal(object, str)
+    sig_guide_updated = pyqtSignal(object, str)
     sig_refresh_ui = pyqtSignal()
     sig_log_error = pyqtSignal(str)
     sig_show_debug = pyqtSignal(str)
     sig_bind_result = pyqtSignal(bool, str)
+    sig_warmup_progress = pyqtSignal(int, int)
+    sig_search_results = pyqtSignal(str, object)
 
     def __init__(self, view_app):
         super().__init__()
@@ -51,22 +68,81 @@ class MainController(QObject):
         self.system = SystemScripts()
         self.window = WindowScripts()
         self.network = NetworkFeatures()
+        self.downloads = shared_scheduler()
+        self.assets = shared_asset_cache()
+        self.warmup = AssetWarmup(self.downloads, self.assets, on_progress=self.sig_warmup_progress.emit)
+        self.crawler = GuideCrawler(self.network, self.parser, depth=GUIDE_PREFETCH_DEPTH)
 
         self.keyboard = KeyboardScripts(window_manager=self.window)
-        self.session = SessionFeatures(parser_script=self.parser)
+        self.session = SessionFeatures(parser_script=self.parser, memory_budget=GUIDE_MEMORY_BUDGET_MB * 1024 * 1024)
         self.ocr = OcrScripts()
         self.overlay = OverlayScripts()
         self.snipping = SnippingTool()
+        self.search = SearchIndex(os.path.join("saves", "search.db"))
+        self.parser.search_index = self.search
+        # Pack hors-ligne : guides et images lus directement dans le fichier (mmap), sans extraction
+        self.pack = open_pack()
+        if self.pack:
+            self.parser.mount_pack(self.pack)
+            self.assets.pack = self.pack
+        # Les guides modifiés par la synchro sont remplacés dans leurs onglets ouverts
+        # Guide modifié : relu depuis la bibliothèque (étapes compactes) avant d'aller aux onglets
+        self.library_sync = LibrarySync(self.network, self.parser,
+                                        on_changed=lambda data, path: self._emit_guide_updated(path))
+        # Sauts d'étape en attente d'ouverture d'un guide ({guide_id: index})
+        self.pending_step_jumps = {}
+        # Dernière revalidation réseau des guides locaux ({guide_id: time.monotonic()})
+        self._revalidated_at = {}
+        # Téléchargements en flux en cours : un même guide n'est jamais écrit par deux flux à la fois
+        self._downloading = set()
+        self._downloading_lock = threading.Lock()
 
         self.sig_open_guide.connect(self._open_guide_slot)
+        self.sig_guide_updated.connect(self._guide_updated_slot)
         self.sig_refresh_ui.connect(self.refresh_ui_state)
         self.sig_log_error.connect(lambda msg: logger.error(msg))
         self.sig_show_debug.connect(lambda p: self.view.show_debug_image(p))
         self.sig_bind_result.connect(self._handle_bind_result_slot)
+        self.sig_warmup_progress.connect(lambda done, total: self.view.ui_guide.show_warmup_progress(done, total))
+        self.sig_search_results.connect(lambda query, hits: self.view.ui_guide.show_search_results(query, hits))
 
     def startup(self):
         logger.info("Contrôleur démarré (PyQt6). Restauration de la session...")
         self.restore_session()
+        self.run_threaded(self._index_library_task)
+
+    def _index_library_task(self):
+        # Anciens guides .json convertis au format compressé avant l'indexation (chemins définitifs)
+        self.parser.compress_library()
+        self.search.index_library(self.parser)
+
+    def shutdown(self):
+        """Vide les sauvegardes différées avant la fermeture de l'application."""
+        logger.info("Fermeture : écriture des sauvegardes en attente...")
+        stats = self.view.ui_guide.render_cache.stats()
+        logger.info(f"Cache de rendu : {stats['hits']} succès / {stats['misses']} échecs, "
+                    f"{stats['entries']} page(s), {stats['bytes'] // 1024} Ko")
+        stats = self.downloads.stats()
+        logger.info(f"Téléchargements : {stats['completed']} terminé(s), {stats['failed']} échec(s), "
+                    f"{stats['retried']} nouvel(s) essai(s), {stats['cancelled']} annulé(s), "
+                    f"latence moyenne {stats['avg_latency_ms']:.0f} ms")
+        self.downloads.shutdown()
+        stats = self.assets.stats()
+        logger.info(f"Cache d'images : {stats['files']} fichier(s) pour {stats['urls']} URL(s), "
+                    f"{stats['bytes'] // 1024} Ko / {stats['max_bytes'] // 1024} Ko, {stats['evictions']} évincé(s)")
+        self.assets.close()
+        self.crawler.shutdown()
+        self.library_sync.cancel()
+        stats = self.crawler.stats()
+        logger.info(f"Guides cités : {stats['fetched']} mis en bibliothèque, {stats['failed']} échec(s)")
+        stats = self.network.http.stats()
+        logger.info(f"HTTP : {stats['requests']} requête(s), {stats['not_modified']} non modifiée(s) (304), "
+                    f"{stats['bytes'] // 1024} Ko reçus")
+        self.network.http.close()
+        self.session.shutdown()
+        self.search.close()
+        if self.pack:
+            self.pack.close()
 
     def run_threaded(self, func):
         def safe_wrapper():
@@ -97,16 +173,44 @@ class MainController(QObject):
                 if data:
                     archive = self.parser.save_guide_to_library(data)
                     final = archive if archive else filename
+                    # Relu depuis la bibliothèque : étapes du store binaire plutôt que les dicts JSON
+                    data = (self.parser.load_guide(archive) if archive else None) or data
                     steps = self.parser.get_steps_list(data)
                     if steps:
                         name = data.get("name", os.path.basename(filename))
                         gid = data.get("id")
                         self.session.add_guide(name, steps, final, gid)
+                        self._warm_guide_assets(final, name, steps)
                         logger.info(f"✅ Chargé : {name}")
                         self.refresh_ui_state()
         except Exception as e:
             logger.error(f"Erreur load json: {e}")
 
+    def action_warmup_library_wrapper(self):
+        """Met en cache les images de toute la bibliothèque (jeu hors-ligne)."""
+        logger.info("🖼️ Préchargement des images de la bibliothèque...")
+        self.run_threaded(lambda: self.warmup.warm_library(self.parser))
+
+    def action_sync_library_wrapper(self):
+        """Revalide toute la bibliothèque auprès de Ganymede (reprend une synchro interrompue)."""
+        if self.library_sync.running:
+            logger.info("🔄 Synchro de la bibliothèque déjà en cours.")
+            return
+        self.run_threaded(self.library_sync.run)
+
+    def _warm_guide_assets(self, key, name, steps):
+        """
+        Images de tout le guide en cache, en priorité basse, avant qu'on navigue jusqu'à elles ;
+        les guides qu'il cite (liens GUIDE:) sont mis en bibliothèque.
+        """
+        def warm():
+            # Hors thread UI : un guide adossé au store décode ici chaque étape depuis le mmap
+            htmls = [self.parser.get_step_web_text(step) for step in steps]
+            self.warmup.warm_guide(key, name, htmls)
+            self.crawler.crawl(htmls)
+
+        self.run_threaded(warm)
+
     def action_bind_window_wrapper(self):
         try:
             if hasattr(self.view.ui_sidebar, 'bind_entry'):
@@ -308,48 +412,16 @@ class MainController(QObject):
                     logger.warning(f"Le guide '{guide.get('name')}' ne contient aucune étape valide.")
                 self.view.ui_guide.update_content(guide, self.parser)
 
-                self.next_travel_command = None
-                self.next_travel_type = "classique"
-                self.next_travel_zaap_name = None
-                current_idx = guide.get('current_idx', 0)
-                steps = guide.get('steps', [])
-
-                if 0 <= current_idx < len(steps):
-                    current_step = steps[current_idx]
-                    raw_html = self.parser.get_step_web_text(current_step, clean_html=False)
-                    clean_text = re.sub(r'<[^>]+>', ' ', raw_html).strip()
-                    clean_text = re.sub(r'\s+', ' ', clean_text)
-
-                    travel_match = re.search(r'allez en.*?\[\s*(-?\d+)\s*,\s*(-?\d+)\s*\]', clean_text, re.IGNORECASE)
-                    if travel_match:
-                        x, y = travel_match.group(1), travel_match.group(2)
-                        self.next_travel_command = f"/travel {x},{y}"
-
-                        # DÉTECTION : Zaapi vs Zaap
-                        # On cherche "Zaapi" spécifiquement en premier
-                        zaapi_regex = r'Zaapi.*?<span[^>]*style="color:\s*rgb\(98,\s*172,\s*255\);?"[^>]*>(.*?)</span>'
-                        zaapi_match = re.search(zaapi_regex, raw_html, re.IGNORECASE | re.DOTALL)
-
-                        # Regex standard pour "Zaap"
-                        zaap_regex = r'Zaap.*?<span[^>]*style="color:\s*rgb\(98,\s*172,\s*255\);?"[^>]*>(.*?)</span>'
-                        zaap_match = re.search(zaap_regex, raw_html, re.IGNORECASE | re.DOTALL)
-
-                        if zaapi_match:
-                            self.next_travel_type = "Zaapi Shortcut"
-                            raw_name = zaapi_match.group(1)
-                            self.next_travel_zaap_name = re.sub(r'<[^>]+>', '', raw_name).strip()
-                        elif zaap_match:
-                            self.next_travel_type = "Zaap Shortcut"
-                            raw_name = zaap_match.group(1)
-                            self.next_travel_zaap_name = re.sub(r'<[^>]+>', '', raw_name).strip()
-                        else:
-                            self.next_travel_type = "classique"
-                            self.next_travel_zaap_name = None
-
-                        log_msg = f"🔔 Commande détectée ({self.next_travel_type}"
-                        if self.next_travel_zaap_name: log_msg += f" -> {self.next_travel_zaap_name}"
-                        log_msg += f") : {travel_match.group(0).strip()}"
-                        logger.info(log_msg)
+                action = self.session.get_step_action(guide, guide.get('current_idx', 0))
+                self.next_travel_command = action.command
+                self.next_travel_type = action.travel_type
+                self.next_travel_zaap_name = action.zaap_name
+
+                if action.command:
+                    log_msg = f"🔔 Commande détectée ({action.travel_type}"
+                    if action.zaap_name: log_msg += f" -> {action.zaap_name}"
+                    log_msg += f") : {action.match_text}"
+                    logger.info(log_msg)
             else:
                 self.view.ui_guide.update_content(None, self.parser)
         except Exception as e:
@@ -368,11 +440,12 @@ class MainController(QObject):
             return
         guide = self.session.get_active_guide()
         if guide and guide['current_idx'] < len(guide['steps']) - 1:
-            cmd_to_run = self.next_travel_command
+            action = self.session.get_step_action(guide, guide['current_idx'])
+            cmd_to_run = action.command
             if self.is_auto_travel_enabled:
-                current_type = self.next_travel_type
-                current_zaap = self.next_travel_zaap_name
-                current_cmd = self.next_travel_command
+                current_type = action.travel_type
+                current_zaap = action.zaap_name
+                current_cmd = action.command
 
                 if current_type == "Zaapi Shortcut":
                     log_name = f" [{current_zaap}]" if current_zaap else ""
@@ -388,8 +461,8 @@ class MainController(QObject):
                     logger.info(f"🚀 Déplacement auto (Classique) : {current_cmd}")
                     self.run_threaded(lambda: self.macro_travel_to_stored_command(current_cmd))
             elif cmd_to_run:
-                log_detail = f" ({self.next_travel_type})"
-                if self.next_travel_zaap_name: log_detail += f" [{self.next_travel_zaap_name}]"
+                log_detail = f" ({action.travel_type})"
+                if action.zaap_name: log_detail += f" [{action.zaap_name}]"
                 logger.info(f"⚠️ Auto-travel désactivé. Commande ignorée{log_detail} : {cmd_to_run}")
             guide['current_idx'] += 1
             self.session.save_current_progress()
@@ -421,6 +494,8 @@ class MainController(QObject):
         self.refresh_ui_state()
 
     def close_tab(self, index):
+        if 0 <= index < len(self.session.open_guides):
+            self.warmup.cancel(self.session.open_guides[index].get('file'))
         self.session.remove_guide(index)
         self.refresh_ui_state()
 
@@ -441,15 +516,24 @@ class MainController(QObject):
         logger.info(f"Traitement lien : {link_string}")
         link_string = link_string.strip()
         if link_string.upper().startswith("GUIDE:"):
-            gid = link_string.split(":")[1].strip()
+            parts = link_string.split(":")
+            gid = parts[1].strip()
             if not gid or not gid.isdigit():
                 logger.error(f"ID de guide invalide : {gid}")
                 return
+            # Forme étendue GUIDE:<id>:<étape> (résultats de recherche)
+            if len(parts) > 2 and parts[2].strip().isdigit():
+                self.pending_step_jumps[gid] = int(parts[2].strip()) - 1
             local_path = self.session.find_guide_in_library(gid)
             if local_path:
                 logger.info(f"Guide {gid} trouvé en local -> Chargement...")
-                self.run_threaded(lambda: self._load_local(local_path, gid))
+                self.run_threaded(lambda: self._load_local(local_path, gid, revalidate=True))
             else:
+                with self._downloading_lock:
+                    if gid in self._downloading:
+                        logger.info(f"Guide {gid} déjà en cours de téléchargement.")
+                        return
+                    self._downloading.add(gid)
                 logger.info(f"Guide {gid} non trouvé en local -> Téléchargement...")
                 self.run_threaded(lambda: self._fetch_remote(gid))
         elif link_string.upper().startswith("STEP:"):
@@ -473,29 +557,130 @@ class MainController(QObject):
             except Exception as e:
                 logger.error(f"Erreur clic travel: {e}")
 
-    def _load_local(self, path, gid):
+    def search_library(self, query):
+        """Recherche hors du thread UI : les résultats reviennent par sig_search_results."""
+        self.run_threaded(lambda: self._search_task(query))
+
+    def _search_task(self, query):
         try:
-            data = self.parser.load_file(path)
+            hits = self.search.search(query)
+        except Exception as e:
+            logger.error(f"Erreur recherche : {e}")
+            hits = []
+        self.sig_search_results.emit(query, hits)
+
+    def open_search_hit(self, hit):
+        """Ouvre un résultat de recherche via la gestion existante des liens STEP:/GUIDE:."""
+        step_num = hit['step_idx'] + 1
+        active = self.session.get_active_guide()
+        if active and hit['guide_id'] and str(active.get('id')) == hit['guide_id']:
+            self.on_guide_link_clicked(f"STEP:{step_num}")
+        elif hit['guide_id']:
+            self.on_guide_link_clicked(f"GUIDE:{hit['guide_id']}:{step_num}")
+        elif active and active['file'] == hit['file']:
+            self.on_guide_link_clicked(f"STEP:{step_num}")
+        else:
+            logger.warning(f"Résultat sans ID de guide, ouverture impossible : {hit['name']}")
+
+    def on_checkbox_toggled(self, cb_key, checked):
+        guide = self.session.get_active_guide()
+        if guide:
+            self.session.save_checkbox_state(guide, cb_key, checked)
+
+    def _load_local(self, path, gid, revalidate=False):
+        try:
+            data = self.parser.load_guide(path)
             if data:
                 self.sig_open_guide.emit(data, path)
             else:
                 self.sig_log_error.emit(f"Impossible de lire le fichier local : {path}")
+                return
         except Exception as e:
             self.sig_log_error.emit(f"Erreur load local: {e}")
+            return
+        # Stale-while-revalidate : la copie locale est déjà affichée, on vérifie ensuite
+        # auprès du serveur (même thread : la mise à jour passe toujours après l'ouverture)
+        if revalidate:
+            self._revalidate_guide(path, gid)
+
+    def _revalidate_guide(self, path, gid):
+        """GET conditionnel du guide ; une version modifiée est archivée puis installée dans les onglets."""
+        now = time.monotonic()
+        last = self._revalidated_at.get(gid)
+        if last is not None and now - last < GUIDE_REVALIDATE_INTERVAL:
+            return
+        self._revalidated_at[gid] = now
+        try:
+            cached = self.parser.load_file(path)
+            if not cached:
+                return
+            data, err = self.network.fetch_guide_data(gid, cached=cached)
+            if err or not data or data is cached:
+                return  # Hors-ligne, erreur serveur ou 304 : la copie locale reste en place
+            # Sans validateur connu (1re revalidation) le serveur renvoie un 200 : comparer le contenu
+            if data == cached:
+                logger.info(f"Guide {gid} : copie locale à jour.")
+                return
+            if not self.parser.get_steps_list(data):
+                logger.warning(f"Guide {gid} : nouvelle version sans étape valide, ignorée.")
+                return
+            new_path = self.parser.save_guide_to_library(data)
+            if new_path:
+                self._emit_guide_updated(new_path)
+            else:
+                self.sig_log_error.emit(f"Erreur à la sauvegarde de la mise à jour du guide {gid}.")
+        except Exception as e:
+            self.sig_log_error.emit(f"Erreur revalidation guide {gid}: {e}")
+
+    def _emit_guide_updated(self, path):
+        """Relit le guide archivé (store binaire, étapes compactes) avant de l'installer dans les onglets."""
+        data = self.parser.load_guide(path)
+        if data:
+            self.sig_guide_updated.emit(data, path)
+        else:
+            self.sig_log_error.emit(f"Impossible de relire le guide mis à jour : {path}")
 
     def _fetch_remote(self, gid):
+        """
+        Téléchargement en flux : l'onglet s'ouvre dès la première étape décodée, les suivantes
+        s'y ajoutent au fil de la réception. Le guide complet (archivé) remplace ensuite cette version.
+        """
+        # gid déjà réservé dans _downloading par on_guide_link_clicked
         try:
-            data, err = self.network.fetch_guide_data(gid)
-            if err:
-                self.sig_log_error.emit(f"❌ Erreur téléchargement guide {gid} : {err}")
-                return
-            if data:
-                path = self.parser.save_guide_to_library(data)
-                if path:
-                    logger.info(f"Guide {gid} sauvegardé dans : {path}")
-                    self.sig_open_guide.emit(data, path)
-                else:
-                    self.sig_log_error.emit("Erreur à la sauvegarde du guide téléchargé.")
+            self._stream_remote(gid)
+        finally:
+            with self._downloading_lock:
+                self._downloading.discard(gid)
+
+    def _stream_remote(self, gid):
+        meta = {}
+        steps = GrowingSteps(self.session.compiler)
+        opened = False
+        path = os.path.join("guides", f"{gid}{LIBRARY_EXT}")
+        try:
+            events = self.parser.stream_guide_to_library(self.network.stream_guide_data(gid), gid)
+            for kind, key, value in events:
+                if kind == "meta":
+                    meta[key] = value
+                elif kind == "step":
+                    steps.append(value)
+                    if not opened:
+                        opened = True
+                        self.sig_open_guide.emit(dict(meta, id=meta.get('id', int(gid)), steps=steps), path)
+                elif kind == "saved":
+                    path = key
+            logger.info(f"Guide {gid} sauvegardé dans : {path} ({len(steps)} étapes)")
+            data = self.parser.load_guide(path)
+            if not data:
+                self.sig_log_error.emit(f"Impossible de relire le guide téléchargé : {path}")
+            elif opened:
+                self.sig_guide_updated.emit(data, path)
+            else:
+                self.sig_open_guide.emit(data, path)  # Aucune étape : _open_guide_slot le signale
+        except (GuideDownloadError, ValueError) as e:
+            self.sig_log_error.emit(f"❌ Erreur téléchargement guide {gid} : {e}")
+            if opened:
+                logger.warning(f"Guide {gid} incomplet : {len(steps)} étape(s) reçue(s), non archivé.")
         except Exception as e:
             self.sig_log_error.emit(f"Erreur fetch remote: {e}")
 
@@ -509,21 +694,61 @@ class MainController(QObject):
             gid = data.get("id")
             idx = self.session.add_guide(name, steps, path, gid)
             self.session.set_active_index(idx)
+            self._warm_guide_assets(path, name, steps)
+            jump = self.pending_step_jumps.get(str(gid))
+            # Guide en cours de téléchargement : l'étape visée n'est peut-être pas encore arrivée
+            if jump is not None and 0 <= jump < len(steps):
+                del self.pending_step_jumps[str(gid)]
+                self.session.get_active_guide()['current_idx'] = jump
+                self.session.save_current_progress()
             logger.info(f"Ouverture réussie : {name} (Index {idx})")
             self.refresh_ui_state()
         except Exception as e:
             logger.error(f"Erreur fatale dans _open_guide_slot: {e}", exc_info=True)
 
+    def _guide_updated_slot(self, data, path):
+        try:
+            steps = self.parser.get_steps_list(data)
+            name = data.get("name", f"Guide {data.get('id')}")
+            updated = self.session.replace_guide_steps(data.get("id"), name, steps, path)
+            if not updated:
+                return
+            logger.info(f"🔄 Guide mis à jour : {name} ({len(steps)} étapes)")
+            self._warm_guide_assets(path, name, steps)
+            active = self.session.get_active_guide()
+            jump = self.pending_step_jumps.pop(str(data.get("id")), None)
+            if jump is not None and 0 <= jump < len(steps):
+                for guide in updated:
+                    guide['current_idx'] = jump
+                if any(guide is active for guide in updated):
+                    self.session.save_current_progress()
+            if any(guide is active for guide in updated):
+                self.refresh_ui_state()
+            else:
+                self.view.ui_guide.update_tabs(self.session.open_guides, self.session.active_index)
+        except Exception as e:
+            logger.error(f"Erreur mise à jour du guide : {e}", exc_info=True)
+
+    def _hydrate_background_tabs(self):
+        """
+        Hydrate les onglets inactifs un par un, en rendant la main à l'UI entre chaque guide.
+        S'arrête une fois le budget mémoire atteint : les suivants seront chargés à leur activation.
+        """
+        for guide in self.session.get_pending_guides():
+            if not self.session.has_memory_budget():
+                break
+            self.session.hydrate_guide(guide)
+            time.sleep(0.1)
+
     def restore_session(self):
         self.is_restoring_session = True
         try:
             guides, idx = self.session.load_last_session()
             if guides:
-                for g in guides:
-                    if g.get('file_path') and os.path.exists(g['file_path']):
-                        d = self.parser.load_file(g['file_path'])
-                        if d: self.session.add_guide(g['name'], self.parser.get_steps_list(d), g['file_path'], g['id'])
-                self.session.set_active_index(idx)
+                # Onglets restaurés en placeholders : seul l'onglet actif est hydraté avant le rendu
+                self.session.restore_tabs(guides, idx)
+                self.session.get_active_guide()
+                QTimer.singleShot(1000, lambda: self.run_threaded(self._hydrate_background_tabs))
             last_char = self.session.get_last_character()
 
             def _restore_ui():
@@ -62,6 +62,13 @@ class AppLauncher(QMainWindow):
         except Exception as e:
             logger.error(f"Erreur au démarrage du contrôleur : {e}", exc_info=True)
 
+    def closeEvent(self, event):
+        try:
+            self.controller.shutdown()
+        except Exception as e:
+            logger.error(f"Erreur à la fermeture du contrôleur : {e}", exc_info=True)
+        super().closeEvent(event)
+
     def setup_ui(self):
         # 1. Sidebar (Gauche)
         self.ui_sidebar = SidebarPanel(self.controller)
@@ -2,11 +2,11 @@ import tkinter as tk
 from tkinter import scrolledtext
 import re
 import os
-import threading
-import urllib.request
 import time
 from html.parser import HTMLParser
 from .controls import CustomCheckbox
+from scripts.download_features import shared_scheduler
+from scripts.asset_cache import shared_asset_cache, VARIANT_ICON, VARIANT_LARGE
 
 
 class HTMLRenderParser(HTMLParser):
@@ -144,6 +144,8 @@ class HTMLRenderParser(HTMLParser):
 
 
 class RichTextDisplay(scrolledtext.ScrolledText):
+    LARGE_IMAGE_HEIGHT = 100  # Au-delà, la variante "grande image" du cache est plus adaptée que l'icône
+
     def __init__(self, master, on_link_click=None, **kwargs):
         # On force les couleurs par défaut pour le thème sombre
         super().__init__(master, bg="#1a1a1a", fg="#c0c0c0", insertbackground="white",
@@ -180,32 +182,28 @@ class RichTextDisplay(scrolledtext.ScrolledText):
 
     def add_async_image(self, url, target_height=24, fit_width=False):
         if not url: return
-        filename = re.sub(r'[<>:"/\\|?*]', '_', url.split('/')[-1])
-        if len(filename) > 50: filename = filename[-50:]
-        cache_dir = "assets"
-        cache_path = os.path.join(cache_dir, filename)
+        assets = shared_asset_cache()
+        variant = VARIANT_LARGE if fit_width or target_height >= self.LARGE_IMAGE_HEIGHT else VARIANT_ICON
         mark_name = f"img_{len(self.images_refs)}_{time.time()}"
         self.mark_set(mark_name, "insert")
         self.mark_gravity(mark_name, tk.LEFT)
 
-        def _fetch():
-            if not os.path.exists(cache_dir): os.makedirs(cache_dir, exist_ok=True)
+        def _on_downloaded(_url, ok):
+            # Thread de téléchargement : l'affichage repasse par la boucle Tk
+            if not ok:
+                print(f"Erreur image {url}")
+                return
             try:
-                data = None
-                if os.path.exists(cache_path):
-                    with open(cache_path, "rb") as f:
-                        data = f.read()
-                else:
-                    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-                    with urllib.request.urlopen(req, timeout=5) as u:
-                        data = u.read()
-                        if data:
-                            with open(cache_path, "wb") as f: f.write(data)
-                if data: self.after(0, lambda: self._show_image(mark_name, data, target_height, fit_width))
-            except Exception as e:
+                with open(assets.path_for(url, variant), "rb") as f:
+                    data = f.read()
+                self.after(0, lambda: self._show_image(mark_name, data, target_height, fit_width))
+            except (OSError, TypeError) as e:
                 print(f"Erreur image {url}: {e}")
 
-        threading.Thread(target=_fetch, daemon=True).start()
+        if assets.path_for(url):
+            _on_downloaded(url, True)
+        else:
+            shared_scheduler().submit(url, assets.store, callback=_on_downloaded)
 
     def _show_image(self, mark_name, data, target_height, fit_width=False):
         try:
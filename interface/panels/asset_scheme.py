@@ -0,0 +1,110 @@
+import hashlib
+from PyQt6.QtCore import QBuffer, QIODevice, pyqtSignal
+from PyQt6.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+
+from .render_cache import RenderCache
+from scripts.download_features import PRIORITY_VISIBLE
+
+SCHEME = b"dtasset"
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+MIME_TYPES = {".png": b"image/png", ".jpg": b"image/jpeg", ".gif": b"image/gif",
+              ".webp": b"image/webp", ".svg": b"image/svg+xml"}
+
+
+def register_scheme():
+    """Déclare dtasset:// auprès de Chromium : à appeler avant la création de la QApplication."""
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class AssetSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Sert les images des guides via dtasset://<sha1 de l'URL>/<variante>.
+
+    Les octets les plus demandés restent en mémoire (LRU borné) devant le cache disque.
+    Une image encore en téléchargement garde sa requête ouverte : Chromium l'affiche
+    dès que les octets arrivent, sans recharger la page.
+    """
+    _stored = pyqtSignal(str)
+    _failed = pyqtSignal(str)
+
+    def __init__(self, assets, downloads, parent=None):
+        super().__init__(parent)
+        self.assets = assets
+        self.downloads = downloads
+        self.memory = RenderCache(MEMORY_CACHE_BYTES)
+        self._urls = {}  # sha1 -> URL d'origine
+        self._pending = {}  # URL -> [(job, variante)] en attente des octets
+        self._stored.connect(self._on_stored)
+        self._failed.connect(self._on_failed)
+        # AssetCache.store peut venir de n'importe quel téléchargement (panneau, préchargement, handler)
+        assets.listeners.append(self._stored.emit)
+
+    def url_for(self, url, variant=None):
+        """URL dtasset:// à placer dans le HTML pour cette image."""
+        key = hashlib.sha1(url.encode()).hexdigest()
+        self._urls[key] = url
+        return f"dtasset://{key}/{variant or ''}"
+
+    def notify_failed(self, url):
+        """Téléchargement définitivement échoué (appelable depuis n'importe quel thread)."""
+        self._failed.emit(url)
+
+    def requestStarted(self, job):
+        request = job.requestUrl()
+        url = self._urls.get(request.host())
+        if url is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        variant = request.path().strip("/") or None
+        if self._serve(job, url, variant):
+            return
+
+        # Pas encore en cache : la requête reste ouverte jusqu'à l'arrivée des octets
+        self._pending.setdefault(url, []).append((job, variant))
+        job.destroyed.connect(lambda *_, u=url, j=job: self._drop(u, j))
+        if not self.downloads.is_queued(url):
+            self.downloads.submit(url, self.assets.store, PRIORITY_VISIBLE, group=self,
+                                  callback=lambda u, ok: ok or self.notify_failed(u))
+
+    # --- INTERNE (thread UI) ---
+    def _serve(self, job, url, variant):
+        cached = self.memory.get((url, variant))
+        if cached is None:
+            # Disque d'abord, puis pack de bibliothèque monté
+            found = self.assets.read(url, variant)
+            if found is None:
+                return False
+            ext, data = found
+            cached = (MIME_TYPES.get(ext, b"application/octet-stream"), data)
+            self.memory.put((url, variant), cached, size=len(data))
+
+        buffer = QBuffer(job)  # Détruit avec la requête
+        buffer.setData(cached[1])
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(cached[0], buffer)
+        return True
+
+    def _on_stored(self, url):
+        for job, variant in self._pending.pop(url, []):
+            try:
+                if not self._serve(job, url, variant):
+                    job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+            except RuntimeError:
+                pass  # Requête abandonnée entre-temps (page rechargée ou détruite)
+
+    def _on_failed(self, url):
+        for job, _ in self._pending.pop(url, []):
+            try:
+                job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+            except RuntimeError:
+                pass
+
+    def _drop(self, url, job):
+        jobs = self._pending.get(url)
+        if jobs:
+            jobs[:] = [(j, v) for j, v in jobs if j is not job]
+            if not jobs:
+                del self._pending[url]
@@ -1,12 +1,23 @@
-from PyQt6.QtCore import QObject, pyqtSlot
+import json
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
 
 class Bridge(QObject):
     """
     Assure la communication entre le JavaScript (WebEngine) et le Controller Python.
+
+    Dans l'autre sens, les signaux poussent vers la page "coquille" (cf. generate_shell_html)
+    le contenu d'une étape ou les variables CSS : un simple patch du DOM.
     """
+    bodyChanged = pyqtSignal(str)
+    cssVarsChanged = pyqtSignal(str)  # JSON {"--font-size": "14px", ...}
+
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
+        # Dernier état poussé, renvoyé quand la coquille (re)devient prête
+        self.ready = False
+        self.body = None
+        self.css_vars = {}
 
     @pyqtSlot(str)
     def handleLink(self, link):
@@ -14,9 +25,33 @@ class Bridge(QObject):
         if link.startswith("GUIDE:") or link.startswith("STEP:") or link.startswith("TRAVEL:"):
             self.controller.on_guide_link_clicked(link)
         elif link.startswith("CB:"):
-            # Ici on pourrait sauvegarder l'état des checkboxes si nécessaire
-            pass
+            # Format : CB:<stepId>_<index>:<true|false>
+            cb_key, checked = link[3:].rsplit(":", 1)
+            self.controller.on_checkbox_toggled(cb_key, checked == "true")
 
     @pyqtSlot(str)
     def copyToClipboard(self, text):
-        self.controller.copy_position()
\ No newline at end of file
+        self.controller.copy_position()
+
+    @pyqtSlot()
+    def shellReady(self):
+        """Appelé par la coquille une fois le canal connecté."""
+        self.ready = True
+        if self.css_vars:
+            self.cssVarsChanged.emit(json.dumps(self.css_vars))
+        if self.body is not None:
+            self.bodyChanged.emit(self.body)
+
+    def reset(self):
+        """La coquille va être rechargée : les envois attendent son prochain shellReady."""
+        self.ready = False
+
+    def push_body(self, html):
+        self.body = html
+        if self.ready:
+            self.bodyChanged.emit(html)
+
+    def push_css_vars(self, variables):
+        self.css_vars.update(variables)
+        if self.ready:
+            self.cssVarsChanged.emit(json.dumps(variables))
@@ -1,115 +1,206 @@
 import re
-from PyQt6.QtCore import QUrl
+from scripts.html_tokenizer import tokenize_html, find_highlight_span, ZAAP_WORD
+from scripts.asset_cache import VARIANT_ICON, VARIANT_LARGE
+
+# --- RÈGLES PRÉCOMPILÉES ---
+COORDS_PATTERN = re.compile(r'\[\s*(-?\d+)\s*,\s*(-?\d+)\s*\]')
+GUIDE_STEP_OPEN = re.compile(r'<span[^>]*class="[^"]*guide-step[^"]*"[^>]*>')
+GUIDE_ID_ATTR = re.compile(r'guideid="(\d+)"')
+STEP_NUMBER_ATTR = re.compile(r'stepnumber="(\d+)"')
+GUIDE_NAME_ATTR = re.compile(r'guidename="([^"]+)"')
+IMG_SRC = re.compile(r'<img src="([^"]+)"')
+QUEST_BLOCK_OPEN = re.compile(r'<div[^>]*class="quest-block"[^>]*>')
+TITLE_ATTR = re.compile(r'title="([^"]+)"')
+QUEST_LEADING_TAG = re.compile(r'^\s*<p>\s*<span[^>]*class="[^"]*tag-[^"]*"[^>]*>.*?</span>\s*:?\s*</p>',
+                               re.IGNORECASE | re.DOTALL)
+CHECKBOX_INPUT = re.compile(r'<input[^>]*type="checkbox"[^>]*>', re.IGNORECASE)
+CHECKBOX_STOP_TAGS = frozenset(('<br>', '</p>', '</div>', '</li>'))
+
+ZAAP_OPEN = '<span class="zaap-shortcut" data-type="zaap-shortcut">'
+SPAN_CLOSE = '</span>'
+DIV_CLOSE = '</div>'
 
 
 class GuideProcessor:
     """
     Classe responsable du pré-traitement du contenu HTML/texte brut
     d'une étape de guide avant son injection dans le QWebEngineView.
+
+    Le HTML est découpé une seule fois en jetons ; chaque réécriture est un étage
+    appliqué à la liste, dans le même ordre que les anciennes passes regex.
+    Un étage ne visite que ses jetons déclencheurs et recopie le reste par tranches.
     """
 
     def __init__(self):
         self.cb_counter = 0
 
-    def _process_zaap_shortcut(self, content):
+    def _process_zaap_shortcut(self, tokens):
         """
-        Détecte et marque une instruction Zaap.
+        Détecte et marque une instruction Zaap : du mot "Zaap" jusqu'à la fermeture
+        du span bleu qui suit. Rien n'est marqué si le span n'est jamais fermé.
         """
-        pattern = re.compile(
-            r'(Zaap.*?<span[^>]*style="color:\s*rgb\(98,\s*172,\s*255\);?"[^>]*>.*?</span>)',
-            re.IGNORECASE | re.DOTALL
-        )
-        content = pattern.sub(r'<span class="zaap-shortcut" data-type="zaap-shortcut">\1</span>', content)
-        return content
-
-    def _process_coordinates(self, content):
+        out, pos = [], 0
+        # str.lower() + 'in' est bien plus rapide qu'une recherche regex insensible à la casse
+        for i in [i for i, raw in enumerate(tokens) if raw[0] != '<' and 'zaap' in raw.lower()]:
+            if i < pos:
+                continue  # Mot déjà inclus dans le raccourci précédent
+            span = find_highlight_span(tokens, i + 1)
+            if span is None:
+                break
+            raw = tokens[i]
+            start = ZAAP_WORD.search(raw).start()
+            out.extend(tokens[pos:i])
+            if start:
+                out.append(raw[:start])
+            out.append(ZAAP_OPEN)
+            out.append(raw[start:])
+            out.extend(tokens[i + 1:span[1] + 1])
+            out.append(SPAN_CLOSE)
+            pos = span[1] + 1
+        out.extend(tokens[pos:])
+        return out
+
+    def _process_coordinates(self, tokens):
         """
         Détecte les coordonnées [x,y] et les rend cliquables.
         Action JS : onLinkClick('TRAVEL:x,y')
         """
-        # Regex pour trouver [x,y] avec gestion des espaces éventuels
-        pattern = re.compile(r'\[\s*(-?\d+)\s*,\s*(-?\d+)\s*\]')
-
-        def replace_match(match):
-            x = match.group(1)
-            y = match.group(2)
-            # On ajoute un style inline pour montrer que c'est cliquable (bleu + curseur main)
-            # Le onclick envoie la commande TRAVEL au contrôleur
-            return (f'<span style="color: #4da6ff; cursor: pointer; font-weight: bold;" '
-                    f'onclick="onLinkClick(\'TRAVEL:{x},{y}\')">[{x},{y}]</span>')
-
-        return pattern.sub(replace_match, content)
-
-    def preprocess_content(self, html, current_guide_id, current_step_id, checkbox_states, image_path_callback):
+        out, pos = [], 0
+        for i in [i for i, raw in enumerate(tokens) if raw[0] != '<' and '[' in raw]:
+            parts = COORDS_PATTERN.split(tokens[i])  # [texte, x, y, texte, x, y, texte]
+            if len(parts) == 1:
+                continue
+            out.extend(tokens[pos:i])
+            for k in range(0, len(parts) - 1, 3):
+                if parts[k]:
+                    out.append(parts[k])
+                x, y = parts[k + 1], parts[k + 2]
+                # Style inline pour montrer que c'est cliquable, le onclick envoie TRAVEL au contrôleur
+                out.append(f'<span style="color: #4da6ff; cursor: pointer; font-weight: bold;" '
+                           f'onclick="onLinkClick(\'TRAVEL:{x},{y}\')">')
+                out.append(f'[{x},{y}]')
+                out.append(SPAN_CLOSE)
+            if parts[-1]:
+                out.append(parts[-1])
+            pos = i + 1
+        out.extend(tokens[pos:])
+        return out
+
+    def _process_guide_links(self, tokens, current_guide_id):
+        """Liens Guides & Tooltips : span guide-step jusqu'au premier </span>."""
+        out, pos = [], 0
+        for i in [i for i, raw in enumerate(tokens) if 'guide-step' in raw and GUIDE_STEP_OPEN.fullmatch(raw)]:
+            if i < pos:
+                continue
+            try:
+                end = tokens.index(SPAN_CLOSE, i + 1)
+            except ValueError:
+                break
+            out.extend(tokens[pos:i])
+            out.append(self._guide_link_tag(tokens[i], current_guide_id))
+            out.extend(tokens[i + 1:end + 1])
+            pos = end + 1
+        out.extend(tokens[pos:])
+        return out
+
+    def _guide_link_tag(self, attrs, current_guide_id):
+        gid_match = GUIDE_ID_ATTR.search(attrs)
+        step_match = STEP_NUMBER_ATTR.search(attrs)
+        name_match = GUIDE_NAME_ATTR.search(attrs)
+
+        gid = gid_match.group(1) if gid_match else "0"
+        step = step_match.group(1) if step_match else None
+        gname = name_match.group(1) if name_match else "Guide"
+
+        link_action = f"GUIDE:{gid}"
+        if step and (gid == "0" or str(gid) == str(current_guide_id)):
+            link_action = f"STEP:{step}"
+
+        link_action = link_action.replace("'", "\\'")
+        return (f'<span class="guide-step" data-tooltip="{gname}" '
+                f'onclick="onLinkClick(\'{link_action}\')">')
+
+    def _process_images(self, tokens, image_url_callback):
+        """
+        Images locales : src réécrit vers le cache (dtasset://), URL d'origine conservée (en place).
+        La variante réduite suit la taille d'affichage : grande image (.img-large/.img-small) ou icône.
+        """
+        for i in [i for i, raw in enumerate(tokens) if raw.startswith('<img src="')]:
+            raw = tokens[i]
+            m = IMG_SRC.match(raw)
+            if m:
+                url = m.group(1)
+                variant = VARIANT_LARGE if 'img-large' in raw or 'img-small' in raw else VARIANT_ICON
+                local = image_url_callback(url, variant)
+                tokens[i] = f'<img src="{local}" data-original-src="{url}"' + raw[m.end():]
+        return tokens
+
+    def _process_quest_blocks(self, tokens):
+        """Quest Blocks : contenu jusqu'au premier </div>, titre en tooltip."""
+        out, pos = [], 0
+        for i in [i for i, raw in enumerate(tokens) if 'quest-block' in raw and QUEST_BLOCK_OPEN.fullmatch(raw)]:
+            if i < pos:
+                continue
+            try:
+                end = tokens.index(DIV_CLOSE, i + 1)
+            except ValueError:
+                break
+            title_match = TITLE_ATTR.search("".join(tokens[i:end]))
+            title = title_match.group(1) if title_match else "Détails"
+            content = QUEST_LEADING_TAG.sub('', "".join(tokens[i + 1:end]))
+            out.extend(tokens[pos:i])
+            out.append(f'<div class="quest-block" data-tooltip="{title}">')
+            out.append('<div>')
+            out.extend(tokenize_html(content))
+            out.append(DIV_CLOSE)
+            out.append(DIV_CLOSE)
+            pos = end + 1
+        out.extend(tokens[pos:])
+        return out
+
+    def _process_checkboxes(self, tokens, current_step_id, checkbox_states):
+        """Checkboxes : texte suivant jusqu'à <br>, </p>, </div>, </li> ou la fin."""
+        out, pos, count = [], 0, len(tokens)
+        for i in [i for i, raw in enumerate(tokens) if raw.startswith(('<i', '<I')) and CHECKBOX_INPUT.fullmatch(raw)]:
+            if i < pos:
+                continue  # Une case dans le texte d'une autre fait partie de ce texte
+            end = i + 1
+            while end < count and not (tokens[end][0] == '<' and tokens[end].lower() in CHECKBOX_STOP_TAGS):
+                end += 1
+            text = "".join(tokens[i + 1:end])
+            # Comme '$' en regex : en fin de contenu, un saut de ligne final reste hors du texte capturé
+            trailing = "\n" if end == count and text.endswith("\n") else ""
+            out.extend(tokens[pos:i])
+            out.append(self._checkbox_row(text[:len(text) - len(trailing)], current_step_id, checkbox_states))
+            if trailing:
+                out.append(trailing)
+            pos = end
+        out.extend(tokens[pos:])
+        return out
+
+    def _checkbox_row(self, following_text, current_step_id, checkbox_states):
+        self.cb_counter += 1
+        unique_key = f"{current_step_id}_{self.cb_counter}"
+        checked_attr = "checked" if checkbox_states.get(unique_key, False) else ""
+        return (f'<div class="checkbox-row">'
+                f'<input type="checkbox" {checked_attr} onclick="onCheckboxClick(\'{unique_key}\', this.checked)">'
+                f'<span class="cb-text">{following_text.strip()}</span></div>')
+
+    def preprocess_content(self, html, current_guide_id, current_step_id, checkbox_states, image_url_callback):
         self.cb_counter = 0
 
-        # 1. Traitement spécifique des Zaap Shortcuts
-        html = self._process_zaap_shortcut(html)
-
-        # 2. Traitement des Coordonnées [x,y] (NOUVEAU)
-        # Doit être fait après le Zaap pour être par-dessus (cliquable à l'intérieur du span Zaap)
-        html = self._process_coordinates(html)
-
-        # 3. Liens Guides & Tooltips
-        def guide_replacer(match):
-            full_span = match.group(0)
-            content = match.group(2)
-            attrs = match.group(1)
-
-            gid_match = re.search(r'guideid="(\d+)"', attrs)
-            step_match = re.search(r'stepnumber="(\d+)"', attrs)
-            name_match = re.search(r'guidename="([^"]+)"', attrs)
-
-            gid = gid_match.group(1) if gid_match else "0"
-            step = step_match.group(1) if step_match else None
-            gname = name_match.group(1) if name_match else "Guide"
-
-            link_action = f"GUIDE:{gid}"
-            if step and (gid == "0" or str(gid) == str(current_guide_id)):
-                link_action = f"STEP:{step}"
-
-            link_action = link_action.replace("'", "\\'")
-            return (f'<span class="guide-step" data-tooltip="{gname}" '
-                    f'onclick="onLinkClick(\'{link_action}\')">{content}</span>')
-
-        html = re.sub(r'(<span[^>]*class="[^"]*guide-step[^"]*"[^>]*>)(.*?)</span>', guide_replacer, html,
-                      flags=re.DOTALL)
-
-        # 4. Images Locales
-        html = re.sub(r'<img src="([^"]+)"',
-                      lambda
-                          m: f'<img src="{QUrl.fromLocalFile(image_path_callback(m.group(1))).toString()}" data-original-src="{m.group(1)}"',
-                      html)
-
-        # 5. Quest Blocks
-        def quest_block_replacer(match):
-            full_div = match.group(0)
-            title_match = re.search(r'title="([^"]+)"', full_div)
-            title = title_match.group(1) if title_match else "Détails"
-            content_match = re.search(r'<div[^>]*class="quest-block"[^>]*>(.*?)</div>', full_div, flags=re.DOTALL)
-            content = content_match.group(1) if content_match else ""
-            content = re.sub(r'^\s*<p>\s*<span[^>]*class="[^"]*tag-[^"]*"[^>]*>.*?</span>\s*:?\s*</p>', '', content,
-                             flags=re.IGNORECASE | re.DOTALL)
-            return (f'<div class="quest-block" data-tooltip="{title}">'
-                    f'<div>{content}</div></div>')
-
-        html = re.sub(r'(<div[^>]*class="quest-block"[^>]*>.*?</div>)', quest_block_replacer, html, flags=re.DOTALL)
-
-        # 6. Checkboxes
-        def checkbox_replacer(match):
-            self.cb_counter += 1
-            idx = self.cb_counter
-            following_text = match.group(2).strip()
-            unique_key = f"{current_step_id}_{idx}"
-            is_checked = checkbox_states.get(unique_key, False)
-            checked_attr = "checked" if is_checked else ""
-            return (f'<div class="checkbox-row">'
-                    f'<input type="checkbox" {checked_attr} onclick="onCheckboxClick(\'{unique_key}\', this.checked)">'
-                    f'<span class="cb-text">{following_text}</span></div>')
-
-        html = re.sub(
-            r'(<input[^>]*type="checkbox"[^>]*>)(.*?)(?=<br>|<\/p>|<\/div>|<\/li>|$)',
-            checkbox_replacer, html, flags=re.IGNORECASE | re.DOTALL
-        )
-
-        return html
\ No newline at end of file
+        # Étages dans l'ordre historique : Zaap, Coordonnées, Liens guides, Images, Quêtes, Checkboxes.
+        # Les coordonnées passent après le Zaap pour rester cliquables à l'intérieur du span Zaap.
+        # Aucun étage n'introduit le déclencheur d'un étage suivant : le test sur l'entrée suffit à en sauter un.
+        tokens = self._process_zaap_shortcut(tokenize_html(html))
+        if '[' in html:
+            tokens = self._process_coordinates(tokens)
+        if 'guide-step' in html:
+            tokens = self._process_guide_links(tokens, current_guide_id)
+        if '<img src="' in html:
+            tokens = self._process_images(tokens, image_url_callback)
+        if 'quest-block' in html:
+            tokens = self._process_quest_blocks(tokens)
+        if CHECKBOX_INPUT.search(html):
+            tokens = self._process_checkboxes(tokens, current_step_id, checkbox_states)
+        return "".join(tokens)
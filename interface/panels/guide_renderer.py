@@ -11,17 +11,31 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
-def generate_full_html(body_content, config):
-    """
-    Génère la page HTML en chargeant le CSS depuis un fichier externe.
-    """
+CSS_PATH = os.path.join("interface", "panels", "assets", "style.css")
+
+# Contenu du CSS mis en cache, relu uniquement si sa date de modification change
+_css_cache = {"mtime": None, "content": None}
+
+
+def css_mtime():
+    """Date de modification (ns) de la feuille de style, None si absente."""
+    try:
+        return os.stat(resource_path(CSS_PATH)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_css():
+    mtime = css_mtime()
+    if _css_cache["content"] is not None and _css_cache["mtime"] == mtime:
+        return _css_cache["content"]
 
     # Utilisation de resource_path pour la compatibilité PyInstaller
     # Le chemin relatif est basé sur la racine du projet
-    css_path = resource_path(os.path.join("interface", "panels", "assets", "style.css"))
+    css_path = resource_path(CSS_PATH)
     css_content = ""
 
-    if os.path.exists(css_path):
+    if mtime is not None:
         try:
             with open(css_path, "r", encoding="utf-8") as f:
                 css_content = f.read()
@@ -40,18 +54,37 @@ def generate_full_html(body_content, config):
         print(f"Fichier CSS introuvable: {css_path}")
         css_content = "body { background-color: #1a1a1a; color: white; }"
 
-    # Injection des variables de config Python dans le CSS (taille police, etc.)
-    # On ajoute un bloc <style> supplémentaire pour surcharger/compléter avec la config dynamique
-    dynamic_css = f"""
+    _css_cache["mtime"], _css_cache["content"] = mtime, css_content
+    return css_content
+
+
+# Clés de config exposées à la feuille de style sous forme de variables CSS (cf. :root dans style.css)
+CSS_VARIABLES = {
+    "font_size": ("--font-size", "px"),
+    "img_large_width": ("--img-large-width", "px"),
+}
+
+
+def css_variables(config):
+    """Variables CSS correspondant à la configuration d'affichage."""
+    return {name: f"{config[key]}{unit}" for key, (name, unit) in CSS_VARIABLES.items() if key in config}
+
+
+def generate_shell_html(config):
+    """
+    Génère la page "coquille" chargée une seule fois par page web.
+    Le contenu des étapes, les variables CSS et les images sont ensuite poussés
+    par le Bridge via le QWebChannel, sans rechargement de la page.
+    """
+    css_content = load_css()
+    root_vars = "; ".join(f"{name}: {value}" for name, value in css_variables(config).items())
+
+    style = f"""
     <style>
         {css_content}
-
-        body {{
-            font-size: {config['font_size']}px;
-        }}
-        .img-large {{
-            width: {config['img_large_width']}px;
-        }}
+    </style>
+    <style id="config-vars">
+        :root {{ {root_vars}; }}
     </style>
     """
 
@@ -61,6 +94,22 @@ def generate_full_html(body_content, config):
         var backend;
         new QWebChannel(qt.webChannelTransport, function (channel) {
             backend = channel.objects.pyBridge;
+
+            // Nouvelle étape : seul le contenu est remplacé
+            backend.bodyChanged.connect(function (html) {
+                document.getElementById('step-content').innerHTML = html;
+                window.scrollTo(0, 0);
+            });
+
+            // Config d'affichage : variables CSS de :root
+            backend.cssVarsChanged.connect(function (json) {
+                var vars = JSON.parse(json);
+                for (var name in vars) {
+                    document.documentElement.style.setProperty(name, vars[name]);
+                }
+            });
+
+            backend.shellReady();
         });
 
         function onLinkClick(link) { 
@@ -79,4 +128,4 @@ def generate_full_html(body_content, config):
     </script>
     """
 
-    return f"<!DOCTYPE html><html><head><meta charset='utf-8'>{dynamic_css}{script}</head><body>{body_content}</body></html>"
\ No newline at end of file
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'>{style}</head><body><div id='step-content'></div>{script}</body></html>"
@@ -1,25 +1,45 @@
-import os
-import hashlib
-import urllib.request
-import threading
 from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile
 from PyQt6.QtWebChannel import QWebChannel
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFrame, QLabel, QPushButton, QLineEdit, QScrollArea,
                              QSizePolicy, QMenu)
 from PyQt6.QtGui import QAction
-from PyQt6.QtCore import Qt, QUrl, pyqtSignal
+from PyQt6.QtCore import Qt, QUrl, QTimer
 
 # Imports des modules découpés
 from .guide_bridge import Bridge
-from .guide_renderer import generate_full_html
+from .guide_renderer import generate_shell_html, css_variables, css_mtime
 from .guide_processor import GuideProcessor
+from .render_cache import RenderCache
+from .asset_scheme import AssetSchemeHandler, SCHEME
+from scripts.download_features import PRIORITY_VISIBLE, PRIORITY_PREFETCH
+
+DEFAULT_CONFIG = {"font_family": "Segoe UI", "font_size": 14, "icon_size": 24, "img_large_width": 400,
+                  "prefetch_steps": True}
+RENDER_CACHE_BYTES = 16 * 1024 * 1024
+PREFETCH_PAGES = 2  # Étapes précédente et suivante
+PREFETCH_DELAY_MS = 100
+EMPTY_BODY = "<div style='color:gray; text-align:center; margin-top:50px;'>Aucun guide chargé</div>"
+
+
+class GuidePage(QWebEnginePage):
+    """Page web chargée une fois avec la coquille HTML, pilotée ensuite par son propre Bridge."""
+
+    def __init__(self, controller, parent):
+        super().__init__(parent)
+        self.setBackgroundColor(Qt.GlobalColor.transparent)
+        # Un Bridge par page : ses signaux ne doivent patcher que cette page
+        self.bridge = Bridge(controller)
+        self.channel = QWebChannel(self)
+        self.channel.registerObject("pyBridge", self.bridge)
+        self.setWebChannel(self.channel)
 
-DEFAULT_CONFIG = {"font_family": "Segoe UI", "font_size": 14, "icon_size": 24, "img_large_width": 400}
+    def load_shell(self, config):
+        self.bridge.reset()
+        self.setHtml(generate_shell_html(config), QUrl("file:///"))
 
 
 class GuidePanel(QWidget):
-    image_loaded = pyqtSignal()
-
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
@@ -33,9 +53,11 @@ class GuidePanel(QWidget):
         self.layout.setSpacing(0)
 
         self.config = DEFAULT_CONFIG.copy()
-        self.assets_dir = os.path.join(os.getcwd(), "assets").replace("\\", "/")
-        os.makedirs(self.assets_dir, exist_ok=True)
-        self.download_queue = set()
+        self.assets = controller.assets
+        self.downloads = controller.downloads
+        # Images servies par dtasset:// (mémoire puis disque) : une image manquante s'affiche à son arrivée
+        self.asset_scheme = AssetSchemeHandler(self.assets, self.downloads, self)
+        QWebEngineProfile.defaultProfile().installUrlSchemeHandler(SCHEME, self.asset_scheme)
 
         self.processor = GuideProcessor()
         self.current_html_content = ""
@@ -43,6 +65,18 @@ class GuidePanel(QWidget):
         self.current_step_id = None
         self.checkbox_states = {}
 
+        # Corps d'étapes déjà rendus : (guide, étape, versions des cases) -> (corps, images)
+        self.render_cache = RenderCache(RENDER_CACHE_BYTES)
+        self.current_page_key = None
+        self.current_image_urls = ()
+
+        # Double tampon : pages cachées préchargées avec les étapes voisines
+        self.current_guide_data = None
+        self.current_parser = None
+        self._buffers = []
+        self._buffer_info = {}  # page -> (clé, corps, images)
+        self._prefetch_pending = False
+
         # Stockage local des guides pour le redimensionnement
         self.cached_guides = []
         self.cached_active_idx = -1
@@ -50,11 +84,9 @@ class GuidePanel(QWidget):
         self.setup_ui()
 
         # Setup WebEngine & Bridge
-        self.channel = QWebChannel()
-        self.bridge = Bridge(self.controller)
-        self.channel.registerObject("pyBridge", self.bridge)
-        self.browser.page().setWebChannel(self.channel)
-        self.image_loaded.connect(self._refresh_display_content)
+        # La page affichée appartient au panneau : la vue détruirait sa page par défaut lors d'un setPage
+        self._shell_mtime = css_mtime()
+        self.browser.setPage(self._create_page())
 
     def setup_ui(self):
         # 1. Zone des Onglets (Conteneur principal)
@@ -113,6 +145,12 @@ class GuidePanel(QWidget):
         self.lbl_position.setStyleSheet("font-size: 14px; font-weight: bold; color: #ffd700; cursor: pointer;")
         self.lbl_position.mousePressEvent = lambda e: self.controller.copy_position()
         nav_layout.addWidget(self.lbl_position)
+
+        # Progression du préchargement des images (guide ouvert ou bibliothèque)
+        self.lbl_warmup = QLabel("")
+        self.lbl_warmup.setStyleSheet("font-size: 12px; color: #888; margin-left: 10px;")
+        self.lbl_warmup.hide()
+        nav_layout.addWidget(self.lbl_warmup)
         nav_layout.addStretch()
 
         self.btn_prev = self._create_btn("◀", self.controller.nav_previous)
@@ -146,12 +184,39 @@ class GuidePanel(QWidget):
             if w == self.btn_next: nav_layout.addSpacing(10)
         self.layout.addWidget(nav_bar)
 
-        # 3. Viewer
+        # 3. Recherche plein texte dans la bibliothèque
+        search_bar = QFrame()
+        search_bar.setFixedHeight(36)
+        search_bar.setStyleSheet("background-color: #1a1a1a;")
+        search_layout = QHBoxLayout(search_bar)
+        search_layout.setContentsMargins(10, 0, 10, 4)
+
+        self.search_entry = QLineEdit()
+        self.search_entry.setPlaceholderText("🔎 Rechercher dans les guides (Entrée)")
+        self.search_entry.setStyleSheet("""
+            QLineEdit { background-color: #121212; border: 1px solid #333344; border-radius: 4px;
+                        padding: 3px 6px; color: white; font-size: 12px; }
+            QLineEdit:focus { border: 1px solid #4da6ff; }
+        """)
+        self.search_entry.returnPressed.connect(self._run_search)
+        search_layout.addWidget(self.search_entry)
+        self.layout.addWidget(search_bar)
+
+        # 4. Viewer
         self.browser = QWebEngineView()
         self.browser.setStyleSheet("background: #1a1a1a;")
-        self.browser.page().setBackgroundColor(Qt.GlobalColor.transparent)
         self.layout.addWidget(self.browser)
 
+    def _create_page(self):
+        """Page coquille (affichée ou tampon caché), avec la config d'affichage courante."""
+        page = GuidePage(self.controller, self)
+        page.bridge.push_css_vars(css_variables(self.config))
+        page.load_shell(self.config)
+        return page
+
+    def _pages(self):
+        return [self.browser.page()] + self._buffers
+
     def _create_btn(self, text, cmd):
         btn = QPushButton(text)
         btn.setFixedSize(30, 30)
@@ -202,6 +267,34 @@ class GuidePanel(QWidget):
 
         menu.exec(self.btn_burger.mapToGlobal(self.btn_burger.rect().bottomLeft()))
 
+    # --- RECHERCHE ---
+    def _run_search(self):
+        query = self.search_entry.text().strip()
+        if not query: return
+        self.controller.search_library(query)
+
+    def show_search_results(self, query, hits):
+        # Résultats d'une ancienne requête (texte modifié depuis) : ignorés
+        if query != self.search_entry.text().strip(): return
+
+        menu = QMenu(self)
+        menu.setStyleSheet("""
+            QMenu { background-color: #252535; color: white; border: 1px solid #4da6ff; }
+            QMenu::item { padding: 5px 20px; }
+            QMenu::item:selected { background-color: #4da6ff; color: white; }
+        """)
+        if not hits:
+            empty = QAction("Aucun résultat", self)
+            empty.setEnabled(False)
+            menu.addAction(empty)
+        for hit in hits:
+            name = (hit['name'][:37] + "...") if len(hit['name']) > 40 else hit['name']
+            action = QAction(f"{name} — Étape {hit['step_idx'] + 1}", self)
+            action.triggered.connect(lambda _, h=hit: self.controller.open_search_hit(h))
+            menu.addAction(action)
+
+        menu.exec(self.search_entry.mapToGlobal(self.search_entry.rect().bottomLeft()))
+
     # --- GESTION REDIMENSIONNEMENT ---
     def resizeEvent(self, event):
         # Recalcule l'affichage des onglets lors du redimensionnement
@@ -285,31 +378,121 @@ class GuidePanel(QWidget):
         self.tabs_layout.addWidget(tab)
 
     # --- IMAGE CACHING ---
-    def _get_cached_image_path(self, url):
-        ext = ".jpg" if ".jpg" in url.lower() or ".jpeg" in url.lower() else ".png"
-        hash_name = hashlib.md5(url.encode()).hexdigest() + ext
-        local_path = os.path.join(self.assets_dir, hash_name)
-        if not os.path.exists(local_path) and url not in self.download_queue:
-            self.download_queue.add(url)
-            threading.Thread(target=self._download_worker, args=(url, local_path), daemon=True).start()
-        return local_path
-
-    def _download_worker(self, url, local_path):
-        try:
-            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req, timeout=10) as r, open(local_path, "wb") as f:
-                f.write(r.read())
-            self.image_loaded.emit()
-        except:
-            pass
-        finally:
-            if url in self.download_queue: self.download_queue.remove(url)
+    def _request_images(self, urls, priority):
+        """Programme le téléchargement des images absentes du cache disque."""
+        for url in urls:
+            if not self.assets.contains(url):
+                self.downloads.submit(url, self.assets.store, priority, group=self,
+                                      callback=self._on_download_finished)
+
+    def show_warmup_progress(self, done, total):
+        if total and done < total:
+            self.lbl_warmup.setText(f"🖼️ {done}/{total}")
+            self.lbl_warmup.show()
+        else:
+            self.lbl_warmup.hide()
+
+    def _on_download_finished(self, url, ok):
+        # Les requêtes dtasset:// réussies sont servies par AssetCache.listeners ; un échec doit les clore
+        if not ok:
+            self.asset_scheme.notify_failed(url)
 
     # --- LOGIQUE D'AFFICHAGE ---
-    def _refresh_display_content(self):
-        if self.current_html_content:
-            final = generate_full_html(self.current_html_content, self.config)
-            self.browser.setHtml(final, QUrl("file:///"))
+    def update_config(self, **values):
+        """Modifie la configuration d'affichage : les pages reçoivent les nouvelles variables CSS."""
+        self.config.update(values)
+        variables = css_variables(self.config)
+        for page in self._pages():
+            page.bridge.push_css_vars(variables)
+        self._schedule_prefetch()
+
+    def _reload_shells_if_css_changed(self):
+        """La feuille de style n'est pas poussée : une modification de style.css recharge les coquilles."""
+        mtime = css_mtime()
+        if mtime != self._shell_mtime:
+            self._shell_mtime = mtime
+            for page in self._pages():
+                page.load_shell(self.config)  # Le Bridge renverra le dernier contenu poussé
+
+    def _step_key(self, guide_data, idx):
+        step_id = guide_data['steps'][idx].get('id', idx)
+        guide_key = guide_data.get('id') or guide_data.get('file') or guide_data.get('name')
+        # Version de l'onglet + version des cases de cette étape (cf. SessionFeatures.save_checkbox_state)
+        versions = (guide_data.get('checkbox_version', 0),
+                    guide_data.get('step_checkbox_versions', {}).get(str(step_id), 0))
+        return guide_key, step_id, versions
+
+    def _render_step(self, guide_data, parser, idx):
+        """(clé, corps, images) d'une étape, depuis le cache ou rendue à la demande."""
+        key = self._step_key(guide_data, idx)
+        cached = self.render_cache.get(key)
+        if cached is not None:
+            body, urls = cached
+            return key, body, urls
+
+        image_urls = []
+
+        def image_url(url, variant):
+            image_urls.append(url)
+            return self.asset_scheme.url_for(url, variant)
+
+        raw = parser.get_step_web_text(guide_data['steps'][idx])
+        body = self.processor.preprocess_content(
+            raw, guide_data.get('id', 0), key[1],
+            guide_data.setdefault('checkboxes', {}), image_url
+        )
+        urls = frozenset(image_urls)
+        self.render_cache.put(key, (body, urls), tags=urls)
+        return key, body, urls
+
+    # --- PRÉCHARGEMENT (DOUBLE TAMPON) ---
+    def _take_buffer(self, key):
+        for page in self._buffers:
+            info = self._buffer_info.get(page)
+            if info and info[0] == key:
+                return page
+        return None
+
+    def _swap_in(self, page):
+        """Affiche une page préchargée ; l'ancienne page devient un tampon (étape précédente)."""
+        old = self.browser.page()
+        self.browser.setPage(page)
+        self._buffers.remove(page)
+        self._buffers.append(old)
+        self._buffer_info[old] = (self.current_page_key, self.current_html_content, self.current_image_urls)
+        self.current_page_key, self.current_html_content, self.current_image_urls = self._buffer_info.pop(page)
+
+    def _schedule_prefetch(self):
+        if self.config.get("prefetch_steps") and not self._prefetch_pending:
+            self._prefetch_pending = True
+            # Laisse la page visible démarrer son chargement avant de remplir les tampons
+            QTimer.singleShot(PREFETCH_DELAY_MS, self._prefetch_neighbours)
+
+    def _prefetch_neighbours(self):
+        self._prefetch_pending = False
+        guide, parser = self.current_guide_data, self.current_parser
+        if not guide or not guide.get('steps') or not self.config.get("prefetch_steps"):
+            return
+        while len(self._buffers) < PREFETCH_PAGES:
+            self._buffers.append(self._create_page())
+
+        idx = guide['current_idx']
+        wanted = {self._step_key(guide, n): n for n in (idx + 1, idx - 1) if 0 <= n < len(guide['steps'])}
+        held = {info[0] for page, info in self._buffer_info.items() if page in self._buffers}
+        free = [p for p in self._buffers if self._buffer_info.get(p, (None,))[0] not in wanted]
+        for key, n in wanted.items():
+            if key in held or not free:
+                continue
+            page = free.pop(0)
+            key, body, urls = self._render_step(guide, parser, n)
+            self._buffer_info[page] = (key, body, urls)
+            page.bridge.push_body(body)
+
+        # Images des étapes voisines, après celles de l'étape affichée
+        for page in self._buffers:
+            info = self._buffer_info.get(page)
+            if info and info[0] in wanted:
+                self._request_images(info[2], PRIORITY_PREFETCH)
 
     def update_tabs(self, guides, active_idx):
         """
@@ -332,22 +515,38 @@ class GuidePanel(QWidget):
 
         step = steps[idx]
         self.current_guide_id = guide_data.get('id', 0)
+        # États des cases propres au guide (persistés par SessionFeatures)
+        self.checkbox_states = guide_data.setdefault('checkboxes', {})
         self.current_step_id = step.get('id', idx)
 
         c = parser.get_step_coords(step)
         self.lbl_position.setText(f"[{c[0]}, {c[1]}]" if c else "")
 
-        raw = parser.get_step_web_text(step)
-        self.current_html_content = self.processor.preprocess_content(
-            raw, self.current_guide_id, self.current_step_id,
-            self.checkbox_states, self._get_cached_image_path
-        )
-        self._refresh_display_content()
+        self.current_guide_data, self.current_parser = guide_data, parser
+        self._reload_shells_if_css_changed()
+        buffer = self._take_buffer(self._step_key(guide_data, idx))
+        if buffer is not None:
+            self._swap_in(buffer)
+        else:
+            self.current_page_key, self.current_html_content, self.current_image_urls = \
+                self._render_step(guide_data, parser, idx)
+            self.browser.page().bridge.push_body(self.current_html_content)
+
+        # Les images encore en attente de l'étape quittée ne sont plus prioritaires
+        self.downloads.cancel_group(self)
+        self._request_images(self.current_image_urls, PRIORITY_VISIBLE)
+        self._schedule_prefetch()
 
     def _reset_view(self):
+        self.current_html_content = ""
+        self.current_page_key = None
+        self.current_image_urls = ()
+        self.current_guide_data = None
+        self._buffer_info.clear()
+        self.downloads.cancel_group(self)
         self.entry_step.setText("--")
         self.lbl_total.setText("/ --")
         self.lbl_position.setText("")
-        self.browser.setHtml("<div style='color:gray; text-align:center; margin-top:50px;'>Aucun guide chargé</div>")
+        self.browser.page().bridge.push_body(EMPTY_BODY)
         self.btn_prev.setDisabled(True);
         self.btn_next.setDisabled(True)
\ No newline at end of file
@@ -0,0 +1,92 @@
+import sys
+from collections import OrderedDict
+
+
+class RenderCache:
+    """
+    Cache LRU borné en octets des pages d'étapes déjà rendues.
+
+    Chaque entrée peut porter des étiquettes (ex : URLs des images qu'elle référence)
+    pour être invalidée précisément quand l'une d'elles change.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size, tags)
+        self._by_tag = {}  # tag -> {key}
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, size=None, tags=()):
+        """Ajoute ou remplace une entrée. size par défaut : empreinte mémoire de value (sys.getsizeof)."""
+        if size is None:
+            size = _sizeof(value)
+        self.discard(key)
+        if size > self.max_bytes:
+            return  # Plus grande que tout le budget : on ne la garde pas
+        tags = frozenset(tags)
+        self._entries[key] = (value, size, tags)
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+        self.bytes_used += size
+        while self.bytes_used > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self.discard(oldest)
+            self.evictions += 1
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes_used -= entry[1]
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+        return True
+
+    def invalidate_tag(self, tag):
+        """Supprime les entrées portant cette étiquette. Retourne le nombre d'entrées retirées."""
+        keys = list(self._by_tag.get(tag, ()))
+        for key in keys:
+            self.discard(key)
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_tag.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+def _sizeof(value):
+    if isinstance(value, (tuple, list, frozenset, set)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
@@ -83,6 +83,8 @@ class SidebarPanel(QWidget):
 
         # --- BAS ---
         self.layout.addStretch()
+        self.layout.addWidget(self._create_btn("🔄 Synchro bibliothèque", self.controller.action_sync_library_wrapper))
+        self.layout.addWidget(self._create_btn("🖼️ Images hors-ligne", self.controller.action_warmup_library_wrapper))
         self.layout.addWidget(self._create_btn("📂 Charger JSON", self.controller.action_load_json_wrapper))
 
     def add_section(self, text):
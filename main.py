@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QFont, QColor, QPalette, QIcon  # Ajout de QIcon
 from PyQt6.QtCore import Qt
 from interface.dashboard import AppLauncher
+from interface.panels.asset_scheme import register_scheme
 
 # Configuration du logging
 logging.basicConfig(
@@ -54,6 +55,8 @@ def apply_dracula_theme(app):
 if __name__ == "__main__":
     sys.excepthook = exception_hook
 
+    # Les schémas d'URL personnalisés doivent être déclarés avant la QApplication
+    register_scheme()
     app = QApplication(sys.argv)
 
     # NOUVEAU : Tentative de chargement de l'icône PNG
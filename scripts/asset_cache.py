@@ -0,0 +1,376 @@
+import io
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+ASSET_CACHE_BYTES = 256 * 1024 * 1024
+LEGACY_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+# Variantes réduites générées au téléchargement, à 2x la taille d'affichage (écrans haute densité)
+VARIANT_ICON = "icon"  # Icônes dans le texte : 18 à 36 px
+VARIANT_LARGE = "large"  # .img-large / .img-small : 300 à 400 px de large
+VARIANT_SIZES = {VARIANT_ICON: (72, 72), VARIANT_LARGE: (800, 4000)}
+RESIZABLE_EXTENSIONS = (".png", ".jpg", ".webp")  # Les GIF gardent leur animation
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_access ON blobs (last_access);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_urls_hash ON urls (hash);
+CREATE TABLE IF NOT EXISTS variants (
+    hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    PRIMARY KEY (hash, name)
+);
+"""
+
+
+class AssetIntegrityError(ValueError):
+    """Contenu téléchargé incomplet ou vide : à retélécharger."""
+
+
+def sniff_extension(data):
+    """Extension déduite des premiers octets (l'URL ne la donne pas toujours)."""
+    if data.startswith(b"\x89PNG"):
+        return ".png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if data.startswith(b"GIF8"):
+        return ".gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    if data.lstrip()[:5] in (b"<svg ", b"<?xml"):
+        return ".svg"
+    return ".bin"
+
+
+class AssetCache:
+    """
+    Cache disque des images des guides, adressé par contenu.
+
+    Un index SQLite associe chaque URL au SHA-256 de son contenu : des URLs différentes
+    aux octets identiques partagent un seul fichier, accompagné de ses variantes réduites
+    (cf. VARIANT_SIZES). La taille d'une entrée compte l'original et ses variantes.
+    Au-delà de max_bytes, les fichiers les moins récemment utilisés sont supprimés, sauf ceux
+    déjà servis pendant la session (des pages affichées ou en cache peuvent y faire référence).
+    """
+
+    def __init__(self, root="assets", max_bytes=ASSET_CACHE_BYTES):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.max_bytes = max_bytes
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.root, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self.listeners = []  # listener(url) après chaque store réussi (thread du téléchargement)
+        self.pack = None  # LibraryPack monté : images lues dedans quand le disque ne les a pas
+        self._touched = {}  # hash -> dernier accès, écrit en base par lot
+        self._session = set()  # Fichiers servis pendant la session : jamais évincés
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._remove_partials()
+        self._has_legacy = self._find_legacy_files()
+        self.bytes_used = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def variant_path(self, digest, name, ext):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.{name}{ext}")
+
+    def path_for(self, url, variant=None):
+        """
+        Chemin local de l'image si elle est en cache, sinon None.
+        variant : VARIANT_ICON ou VARIANT_LARGE ; l'original est servi si l'image est déjà assez petite.
+        """
+        path = self._lookup(url, variant)
+        if path is None and self._import_legacy(url):
+            path = self._lookup(url, variant)
+        return path
+
+    def _lookup(self, url, variant):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.hash, b.ext, v.ext FROM urls u JOIN blobs b ON b.hash = u.hash "
+                "LEFT JOIN variants v ON v.hash = b.hash AND v.name = ? WHERE u.url = ?",
+                (variant, url)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            path = self.blob_path(row[0], row[1])
+            if row[2] is not None and os.path.exists(self.variant_path(row[0], variant, row[2])):
+                path = self.variant_path(row[0], variant, row[2])
+            elif not os.path.exists(path):
+                # Fichier supprimé hors de l'application : l'entrée est oubliée
+                self._forget_blob(row[0])
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[row[0]] = time.time()
+            self._session.add(row[0])
+            return path
+
+    def read(self, url, variant=None):
+        """(extension, octets) de l'image depuis le disque, sinon depuis le pack monté ; None si absente."""
+        path = self.path_for(url, variant)
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    return os.path.splitext(path)[1], f.read()
+            except OSError:
+                pass
+        if self.pack is not None:
+            return self.pack.read_asset(url, variant)
+        return None
+
+    def contains(self, url, include_pack=True):
+        """URL déjà en cache ou dans le pack monté (sans compter comme un accès)."""
+        if include_pack and self.pack is not None and self.pack.has_asset(url):
+            return True
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None:
+                return True
+        return self._import_legacy(url)
+
+    def export_entries(self):
+        """[(url, hash, extension, [(variante, extension)])] de toutes les images en cache."""
+        with self._lock:
+            rows = self._conn.execute("SELECT u.url, b.hash, b.ext FROM urls u JOIN blobs b ON b.hash = u.hash").fetchall()
+            variants = {}
+            for digest, name, ext in self._conn.execute("SELECT hash, name, ext FROM variants"):
+                variants.setdefault(digest, []).append((name, ext))
+        return [(url, digest, ext, variants.get(digest, [])) for url, digest, ext in rows]
+
+    def store(self, url, data, expected_size=None, variants=None):
+        """
+        Enregistre le contenu téléchargé de url et retourne son chemin local.
+        Lève AssetIntegrityError si le contenu est vide ou plus court que annoncé.
+        variants : [(nom, extension, octets)] déjà calculées (import d'un pack), sinon générées ici.
+        """
+        if not data or (expected_size is not None and len(data) != expected_size):
+            raise AssetIntegrityError(f"{url} : {len(data)} octet(s) reçus, {expected_size} annoncés")
+
+        digest = hashlib.sha256(data).hexdigest()
+        ext = sniff_extension(data)
+        path = self.blob_path(digest, ext)
+        now = time.time()
+
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        # Réduction hors verrou : seul le premier téléchargement d'un contenu la paie
+        if known:
+            variants = []
+        elif variants is None:
+            variants = make_variants(data, ext)
+
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if not known or not os.path.exists(path):
+                _write_atomic(path, data)
+            with self._conn:
+                if not known:
+                    size = len(data)
+                    for name, variant_ext, variant_data in variants:
+                        _write_atomic(self.variant_path(digest, name, variant_ext), variant_data)
+                        self._conn.execute("INSERT OR REPLACE INTO variants (hash, name, ext) VALUES (?, ?, ?)",
+                                           (digest, name, variant_ext))
+                        size += len(variant_data)
+                    self._conn.execute("INSERT INTO blobs (hash, ext, size, last_access) VALUES (?, ?, ?, ?)",
+                                       (digest, ext, size, now))
+                    self.bytes_used += size
+                self._conn.execute("INSERT OR REPLACE INTO urls (url, hash, fetched_at) VALUES (?, ?, ?)",
+                                   (url, digest, now))
+            self._touched[digest] = now
+            self._session.add(digest)
+            if self.bytes_used > self.max_bytes:
+                self._evict()
+        for listener in self.listeners:
+            listener(url)
+        return path
+
+    def stats(self):
+        with self._lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            urls = self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        return {
+            "files": files,
+            "urls": urls,
+            "bytes": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    # --- INTERNE (verrou tenu) ---
+    def _flush_touched(self):
+        if self._touched:
+            with self._conn:
+                self._conn.executemany("UPDATE blobs SET last_access = ? WHERE hash = ?",
+                                       [(t, h) for h, t in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self):
+        """Supprime les fichiers les moins récemment utilisés jusqu'à revenir sous le budget."""
+        self._flush_touched()
+        rows = self._conn.execute("SELECT hash, size FROM blobs ORDER BY last_access").fetchall()
+        for digest, size in rows:
+            if self.bytes_used <= self.max_bytes:
+                break
+            if digest in self._session:
+                continue
+            self._forget_blob(digest)
+            self.evictions += 1
+        self._conn.commit()
+        if self.bytes_used > self.max_bytes:
+            logger.info(f"Cache d'images : budget dépassé par les images de la session "
+                        f"({self.bytes_used // 1024} Ko / {self.max_bytes // 1024} Ko)")
+
+    def _forget_blob(self, digest):
+        row = self._conn.execute("SELECT ext, size FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return
+        paths = [self.blob_path(digest, row[0])]
+        paths += [self.variant_path(digest, name, ext) for name, ext in
+                  self._conn.execute("SELECT name, ext FROM variants WHERE hash = ?", (digest,))]
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._conn.execute("DELETE FROM variants WHERE hash = ?", (digest,))
+        self._conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+        self._conn.execute("DELETE FROM urls WHERE hash = ?", (digest,))
+        self._touched.pop(digest, None)
+        self.bytes_used -= row[1]
+
+    def _remove_partials(self):
+        """Fichiers temporaires laissés par une écriture interrompue."""
+        for folder, _, files in os.walk(self.objects_dir):
+            for name in files:
+                if name.endswith(".part"):
+                    try:
+                        os.remove(os.path.join(folder, name))
+                    except OSError:
+                        pass
+
+    # --- ANCIEN CACHE ---
+    def _find_legacy_files(self):
+        """Images de l'ancien cache présentes à la racine : importées une à une à leur première demande."""
+        try:
+            with os.scandir(self.root) as entries:
+                return any(e.is_file() and e.name.lower().endswith(LEGACY_EXTENSIONS) for e in entries)
+        except OSError:
+            return False
+
+    def _legacy_paths(self, url):
+        """Noms de l'ancien cache : md5 de l'URL (panneau Qt), puis fin du nom de fichier (ancienne vue Tk)."""
+        lower = url.lower()
+        ext = ".jpg" if ".jpg" in lower or ".jpeg" in lower else ".png"
+        yield os.path.join(self.root, hashlib.md5(url.encode()).hexdigest() + ext)
+        name = re.sub(r'[<>:"/\\|?*]', '_', url.split('/')[-1])[-50:]
+        if name.lower().endswith(LEGACY_EXTENSIONS):
+            yield os.path.join(self.root, name)
+
+    def _import_legacy(self, url):
+        """Copie de l'ancien cache pour url : enregistrée dans le cache par contenu, puis supprimée."""
+        if not self._has_legacy:
+            return False
+        for path in self._legacy_paths(url):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            try:
+                self.store(url, data)
+                imported = True
+            except AssetIntegrityError:
+                imported = False  # Fichier vide (téléchargement interrompu) : à retélécharger
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            if imported:
+                logger.debug(f"Cache d'images : {os.path.basename(path)} repris de l'ancien cache.")
+            return imported
+        return False
+
+def make_variants(data, ext):
+    """Variantes réduites [(nom, extension, octets)] des images plus grandes que leur taille d'affichage."""
+    if ext not in RESIZABLE_EXTENSIONS:
+        return []
+    variants = []
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            if img.mode == "P":
+                img = img.convert("RGBA")
+            for name, box in VARIANT_SIZES.items():
+                if img.width <= box[0] and img.height <= box[1]:
+                    continue  # L'original est déjà assez petit
+                thumb = img.copy()
+                thumb.thumbnail(box, Image.Resampling.LANCZOS)
+                out = io.BytesIO()
+                if ext == ".jpg":
+                    thumb.convert("RGB").save(out, "JPEG", quality=88)
+                    variants.append((name, ".jpg", out.getvalue()))
+                else:
+                    thumb.save(out, "PNG")
+                    variants.append((name, ".png", out.getvalue()))
+    except Exception as e:
+        logger.debug(f"Cache d'images : pas de variante réduite ({e})")
+        return []
+    return variants
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Fichier temporaire puis renommage : jamais d'image tronquée sous le nom définitif
+    tmp_path = f"{path}.{threading.get_ident()}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_asset_cache():
+    """Cache d'images commun à toute l'application (créé au premier appel)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AssetCache()
+        return _shared
@@ -0,0 +1,111 @@
+import re
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+GUIDE_STEP_SPAN = re.compile(r'<span[^>]*class="[^"]*guide-step[^"]*"[^>]*>')
+GUIDE_ID_ATTR = re.compile(r'guideid="(\d+)"')
+
+
+def extract_guide_ids(htmls):
+    """IDs distincts des guides cités par les spans guide-step, dans l'ordre d'apparition."""
+    ids = {}
+    for html in htmls:
+        if 'guide-step' in html:
+            for span in GUIDE_STEP_SPAN.findall(html):
+                match = GUIDE_ID_ATTR.search(span)
+                if match:
+                    ids[match.group(1)] = None
+    return list(ids)
+
+
+class GuideCrawler:
+    """
+    Télécharge en tâche de fond les guides cités par des liens GUIDE: et absents de la
+    bibliothèque : le clic suivant dans une chaîne de guides s'ouvre alors en local.
+
+    - depth=1 : guides cités par le guide ouvert ; au-delà, leurs propres liens sont suivis
+      (guides déjà locaux compris) jusqu'à la profondeur demandée.
+    - Au plus workers guides téléchargés en même temps.
+    - Un guide n'est visité qu'une fois par session (sauf s'il est revu avec plus de profondeur).
+    """
+
+    def __init__(self, network, parser_script, folder="guides", depth=1, workers=2):
+        self.network = network
+        self.parser = parser_script
+        self.folder = folder
+        self.depth = depth
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._seen = {}  # id -> profondeur restante la plus grande déjà programmée
+        self._stopped = False
+
+        self.fetched = 0  # Compteurs protégés par _lock (mis à jour par les threads du préchargement)
+        self.failed = 0
+
+        self._threads = [threading.Thread(target=self._run, name=f"GuideCrawler-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def crawl(self, htmls, depth=None, exclude=None):
+        """Programme les guides cités par htmls. Retourne le nombre de guides ajoutés à la file."""
+        depth = self.depth if depth is None else depth
+        if depth <= 0:
+            return 0
+        remaining = depth - 1
+        ids = [gid for gid in extract_guide_ids(htmls) if gid != str(exclude)]
+        with self._lock:
+            if self._stopped:
+                return 0
+            new = [gid for gid in ids if self._seen.get(gid, -1) < remaining]
+            for gid in new:
+                self._seen[gid] = remaining
+        for gid in new:
+            self._queue.put((gid, remaining))
+        return len(new)
+
+    def stats(self):
+        with self._lock:
+            return {"fetched": self.fetched, "failed": self.failed, "queued": self._queue.qsize()}
+
+    def shutdown(self):
+        """Arrête les threads : les guides encore en file sont abandonnés."""
+        with self._lock:
+            self._stopped = True
+        for _ in self._threads:
+            self._queue.put(None)
+
+    # --- INTERNE ---
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None or self._stopped:
+                return
+            gid, remaining = item
+            try:
+                self._visit(gid, remaining)
+            except Exception as e:
+                logger.error(f"Préchargement du guide {gid} : {e}")
+
+    def _visit(self, gid, remaining):
+        path = self.parser.find_in_library(gid, self.folder)
+        if path:
+            if remaining <= 0:
+                return
+            data = self.parser.load_file(path)
+        else:
+            data, err = self.network.fetch_guide_data(gid)
+            if err or not data or not self.parser.save_guide_to_library(data):
+                with self._lock:
+                    self.failed += 1
+                return
+            with self._lock:
+                self.fetched += 1
+            logger.info(f"🔗 Guide référencé mis en bibliothèque : {data.get('name', gid)}")
+
+        if data and remaining > 0:
+            steps = self.parser.get_steps_list(data)
+            self.crawl([self.parser.get_step_web_text(step) for step in steps], remaining, exclude=gid)
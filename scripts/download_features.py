@@ -0,0 +1,239 @@
+import time
+import heapq
+import logging
+import threading
+import itertools
+import requests
+from urllib.parse import urlsplit
+from scripts.http_client import shared_http_client
+
+logger = logging.getLogger(__name__)
+
+# Plus petit = servi en premier
+PRIORITY_VISIBLE = 0  # Images de l'étape affichée
+PRIORITY_PREFETCH = 1  # Images des étapes préchargées
+PRIORITY_WARMUP = 2  # Préchargement d'un guide entier ou de la bibliothèque
+
+
+class DownloadJob:
+    def __init__(self, url, store, priority, group):
+        self.url = url
+        self.store = store
+        self.priority = priority
+        self.groups = {group}  # Annulé seulement quand tous ses demandeurs l'ont abandonné
+        self.host = urlsplit(url).netloc
+        self.callbacks = []
+        self.running = False
+        self.attempts = 0
+        self.not_before = 0.0  # Prochain essai autorisé (backoff)
+        self.seq = None  # Entrée de la file en vigueur
+        self.enqueued_at = time.monotonic()
+
+
+class DownloadScheduler:
+    """
+    Téléchargements de fichiers (images des guides) par un pool borné de threads.
+    Le contenu reçu est confié à store(url, data, taille_annoncée), ex : AssetCache.store.
+
+    - Une URL n'est téléchargée qu'une fois à la fois : les demandes répétées partagent le même job.
+    - Au plus per_host téléchargements simultanés par hôte.
+    - File à priorités : les images de l'étape affichée passent avant celles préchargées.
+    - Erreurs réseau, 5xx/429 et contenus incomplets (ValueError de store) réessayés avec un backoff exponentiel.
+    - Les jobs en attente d'un groupe (ex : un panneau) peuvent être annulés en bloc ; un job demandé
+      par plusieurs groupes n'est annulé qu'une fois abandonné par tous (group=None : jamais).
+    Les callbacks (url, ok) sont appelés depuis un thread de téléchargement.
+    """
+
+    def __init__(self, workers=4, per_host=2, retries=3, backoff=0.5, timeout=10, http=None):
+        self.http = http or shared_http_client()
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._heap = []  # (priorité, seq, job)
+        self._seq = itertools.count()
+        self._jobs = {}  # url -> job en attente ou en cours
+        self._running_hosts = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.cancelled = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._wait_total = 0.0
+        self._started = 0
+
+        self._threads = [threading.Thread(target=self._run, name=f"Download-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, url, store, priority=PRIORITY_VISIBLE, group=None, callback=None):
+        """Programme le téléchargement de url ; son contenu sera passé à store."""
+        with self._cond:
+            job = self._jobs.get(url)
+            if job is None:
+                job = DownloadJob(url, store, priority, group)
+                self._jobs[url] = job
+                self._push(job)
+            else:
+                job.groups.add(group)
+                if not job.running and priority < job.priority:
+                    job.priority = priority
+                    self._push(job)
+            if callback:
+                job.callbacks.append(callback)
+            self._cond.notify()
+        return job
+
+    def is_queued(self, url):
+        """URL en attente ou en cours de téléchargement."""
+        with self._cond:
+            return url in self._jobs
+
+    def cancel_group(self, group):
+        """Annule les jobs en attente du groupe (les téléchargements en cours se terminent)."""
+        with self._cond:
+            doomed = []
+            for url, job in self._jobs.items():
+                if group in job.groups and not job.running:
+                    job.groups.discard(group)
+                    if not job.groups:
+                        doomed.append(url)
+            for url in doomed:
+                del self._jobs[url]  # Son entrée dans la file devient périmée
+            self.cancelled += len(doomed)
+        return len(doomed)
+
+    def stats(self):
+        with self._cond:
+            running = sum(self._running_hosts.values())
+            done = self.completed + self.failed
+            return {
+                "queued": len(self._jobs) - running,
+                "running": running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "retried": self.retried,
+                "cancelled": self.cancelled,
+                "avg_latency_ms": self._latency_total / done * 1000 if done else 0.0,
+                "max_latency_ms": self._latency_max * 1000,
+                "avg_wait_ms": self._wait_total / self._started * 1000 if self._started else 0.0
+            }
+
+    def shutdown(self):
+        """Arrête les threads : les jobs en attente sont abandonnés."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    # --- INTERNE ---
+    def _push(self, job):
+        job.seq = next(self._seq)
+        heapq.heappush(self._heap, (job.priority, job.seq, job))
+
+    def _next_job(self, now):
+        """Meilleur job prêt dont l'hôte a de la place, et l'heure du prochain réveil utile."""
+        skipped, found, wake = [], None, None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            job = entry[2]
+            if self._jobs.get(job.url) is not job or entry[1] != job.seq:
+                continue  # Annulé, ou remplacé par une entrée plus prioritaire
+            if job.not_before > now:
+                wake = job.not_before if wake is None else min(wake, job.not_before)
+            elif self._running_hosts.get(job.host, 0) < self.per_host:
+                found = job
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        return found, wake
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    job, wake = self._next_job(now)
+                    if job:
+                        break
+                    self._cond.wait(None if wake is None else wake - now)
+                job.running = True
+                self._running_hosts[job.host] = self._running_hosts.get(job.host, 0) + 1
+                self._started += 1
+                self._wait_total += now - job.enqueued_at
+
+            ok = self._attempt(job)
+
+            callbacks = []
+            with self._cond:
+                job.running = False
+                self._running_hosts[job.host] -= 1
+                if ok is None and self._jobs.get(job.url) is job:
+                    self.retried += 1
+                    job.not_before = time.monotonic() + self.backoff * 2 ** (job.attempts - 1)
+                    self._push(job)
+                else:
+                    self._jobs.pop(job.url, None)
+                    latency = time.monotonic() - job.enqueued_at
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    callbacks = job.callbacks
+                self._cond.notify_all()
+
+            for callback in callbacks:
+                try:
+                    callback(job.url, bool(ok))
+                except Exception as e:
+                    logger.error(f"Téléchargement : erreur du callback pour {job.url} : {e}")
+
+    def _attempt(self, job):
+        """True si téléchargé, None s'il faut réessayer, False en cas d'échec définitif."""
+        job.attempts += 1
+        try:
+            self._download(job)
+            return True
+        except requests.HTTPError as e:
+            code = e.response.status_code
+            retry = code == 429 or code >= 500
+            error = f"HTTP {code}"
+        except (requests.RequestException, OSError, ValueError) as e:
+            retry, error = True, str(e)
+
+        if retry and job.attempts <= self.retries:
+            return None
+        logger.warning(f"Téléchargement : échec de {job.url} après {job.attempts} essai(s) ({error})")
+        return False
+
+    def _download(self, job):
+        response = self.http.get(job.url, timeout=self.timeout)
+        response.raise_for_status()
+        # La taille annoncée permet à store de refuser un contenu tronqué ;
+        # avec compression, elle compte les octets transférés et non le contenu décodé
+        length = response.headers.get("Content-Length")
+        encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+        expected = int(length) if length and length.isdigit() and not encoded else None
+        job.store(job.url, response.content, expected)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler():
+    """Ordonnanceur commun à toute l'application (créé au premier appel)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DownloadScheduler()
+        return _shared
@@ -0,0 +1,65 @@
+import re
+import logging
+from collections import namedtuple
+
+from scripts.html_tokenizer import tokenize_html, tokens_to_text, find_highlighted_after, ZAAP_WORD, ZAAPI_WORD
+
+logger = logging.getLogger(__name__)
+
+# --- MOTIFS PRÉCOMPILÉS ---
+TAG_PATTERN = re.compile(r'<[^>]+>')
+TRAVEL_PATTERN = re.compile(r'allez en.*?\[\s*(-?\d+)\s*,\s*(-?\d+)\s*\]', re.IGNORECASE)
+
+# Métadonnées d'action d'une étape, calculées une seule fois au chargement du guide
+StepAction = namedtuple("StepAction", ["command", "travel_type", "zaap_name", "match_text", "clean_text"])
+EMPTY_ACTION = StepAction(None, "classique", None, None, "")
+
+
+class GuideCompiler:
+    """
+    Étape de compilation d'un guide : précalcule pour chaque étape la commande
+    de déplacement, son type (classique / Zaap / Zaapi), le nom du Zaap et le texte nettoyé.
+    """
+
+    def __init__(self, parser_script):
+        self.parser = parser_script
+
+    def compile_step(self, step):
+        raw_html = self.parser.get_step_web_text(step, clean_html=False)
+        # Un seul découpage en jetons, partagé par le nettoyage et la détection Zaap
+        tokens = tokenize_html(raw_html)
+        clean_text = tokens_to_text(tokens)
+
+        travel_match = TRAVEL_PATTERN.search(clean_text)
+        if not travel_match:
+            return StepAction(None, "classique", None, None, clean_text)
+
+        x, y = travel_match.group(1), travel_match.group(2)
+        command = f"/travel {x},{y}"
+
+        # DÉTECTION : Zaapi vs Zaap (on cherche "Zaapi" spécifiquement en premier)
+        travel_type = "classique"
+        zaap_name = find_highlighted_after(tokens, ZAAPI_WORD)
+        if zaap_name is not None:
+            travel_type = "Zaapi Shortcut"
+        else:
+            zaap_name = find_highlighted_after(tokens, ZAAP_WORD)
+            if zaap_name is not None:
+                travel_type = "Zaap Shortcut"
+
+        return StepAction(command, travel_type, zaap_name, travel_match.group(0).strip(), clean_text)
+
+    def compile_steps(self, steps):
+        """Retourne la table d'actions (une entrée par étape, même ordre que steps)."""
+        precompiled = getattr(steps, 'actions', None)
+        if precompiled is not None:
+            return precompiled
+        return [self.safe_compile_step(step) for step in steps]
+
+    def safe_compile_step(self, step):
+        """compile_step, ou EMPTY_ACTION si l'étape est inexploitable."""
+        try:
+            return self.compile_step(step)
+        except Exception as e:
+            logger.error(f"Compilation étape impossible : {e}")
+            return EMPTY_ACTION
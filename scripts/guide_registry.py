@@ -0,0 +1,91 @@
+import os
+import sys
+
+MEMORY_BUDGET = 64 * 1024 * 1024  # Octets d'étapes gardés pour les onglets inactifs
+
+
+def payload_bytes(steps):
+    """
+    Estimation de la mémoire occupée par les étapes d'un onglet.
+    Store binaire : taille du fichier projeté (ses pages deviennent résidentes une fois lues).
+    """
+    if steps is None:
+        return 0
+    store = getattr(steps, 'store', None)
+    if store is not None:
+        try:
+            return os.path.getsize(store.path)
+        except OSError:
+            return 0
+    total = sys.getsizeof(steps)
+    for step in steps:
+        total += sys.getsizeof(step)
+        values = step.values() if isinstance(step, dict) else (getattr(step, '_html', None),)
+        total += sum(sys.getsizeof(value) for value in values if value is not None)
+    return total
+
+
+class GuideRegistry:
+    """
+    Onglets ouverts : liste ordonnée (celle affichée) et index par id et par nom,
+    pour retrouver un guide déjà ouvert sans parcourir les onglets.
+    Chaque onglet mémorise son dernier passage au premier plan ('last_active') pour le budget mémoire.
+    """
+
+    def __init__(self):
+        self.guides = []
+        self._by_id = {}
+        self._by_name = {}
+        self._positions = {}  # id(onglet) -> index dans guides
+        self._clock = 0
+
+    def __len__(self):
+        return len(self.guides)
+
+    def __iter__(self):
+        return iter(self.guides)
+
+    def __getitem__(self, index):
+        return self.guides[index]
+
+    def find(self, guide_id=None, name=None):
+        """Index du premier onglet de même id (ou de même nom si guide_id est vide), -1 sinon."""
+        guide = self._by_id.get(str(guide_id)) if guide_id else self._by_name.get(name)
+        return self._positions[id(guide)] if guide is not None else -1
+
+    def append(self, guide):
+        guide.setdefault('last_active', 0)
+        self.guides.append(guide)
+        self._index(guide, len(self.guides) - 1)
+        return len(self.guides) - 1
+
+    def remove(self, index):
+        guide = self.guides.pop(index)
+        self._reindex()
+        return guide
+
+    def rename(self, guide, name):
+        guide['name'] = name
+        self._reindex()
+
+    def touch(self, guide):
+        """Marque l'onglet comme le plus récemment affiché."""
+        self._clock += 1
+        guide['last_active'] = self._clock
+
+    def eviction_candidates(self, active):
+        """Onglets inactifs chargés en mémoire, du moins récemment affiché au plus récent."""
+        loaded = [g for g in self.guides if g is not active and g.get('steps') is not None]
+        return sorted(loaded, key=lambda g: g['last_active'])
+
+    # --- INTERNE ---
+    def _index(self, guide, position):
+        self._positions[id(guide)] = position
+        if guide.get('id'):
+            self._by_id.setdefault(str(guide['id']), guide)
+        self._by_name.setdefault(guide['name'], guide)
+
+    def _reindex(self):
+        self._by_id, self._by_name, self._positions = {}, {}, {}
+        for position, guide in enumerate(self.guides):
+            self._index(guide, position)
@@ -0,0 +1,58 @@
+import re
+
+# Découpage d'un HTML d'étape en liste de jetons bruts (balise ou texte).
+# Le texte brut est conservé à l'identique : ''.join(tokens) redonne l'entrée.
+TOKEN_PATTERN = re.compile(r'<[^>]+>|[^<]+|<')
+
+# --- MOTIFS PRÉCOMPILÉS SUR JETONS ---
+BLUE_SPAN_TAG = re.compile(r'<span[^>]*style="color:\s*rgb\(98,\s*172,\s*255\);?"[^>]*>', re.IGNORECASE)
+CLOSE_SPAN_TAG = re.compile(r'</span>', re.IGNORECASE)
+ZAAP_WORD = re.compile(r'Zaap', re.IGNORECASE)
+ZAAPI_WORD = re.compile(r'Zaapi', re.IGNORECASE)
+
+
+def tokenize_html(html):
+    """Liste des jetons (balises et textes). Comme TAG_PATTERN, une balise va de '<' au premier '>'."""
+    return TOKEN_PATTERN.findall(html)
+
+
+def is_tag(raw):
+    return raw[0] == '<' and len(raw) > 1
+
+
+def tokens_to_text(tokens):
+    """Texte nettoyé : chaque balise devient un espace, les blancs sont réduits."""
+    text = "".join(' ' if is_tag(raw) else raw for raw in tokens)
+    return " ".join(text.split())
+
+
+def find_highlight_span(tokens, start=0):
+    """
+    Indices (ouverture, fermeture) du premier span bleu à partir de start,
+    fermé par le premier </span> qui le suit. None si absent.
+    """
+    open_idx = None
+    for idx in range(start, len(tokens)):
+        raw = tokens[idx]
+        if not is_tag(raw):
+            continue
+        if open_idx is None:
+            if BLUE_SPAN_TAG.fullmatch(raw):
+                open_idx = idx
+        elif CLOSE_SPAN_TAG.fullmatch(raw):
+            return open_idx, idx
+    return None
+
+
+def find_highlighted_after(tokens, word_pattern):
+    """
+    Contenu texte du premier span bleu (nom de Zaap/Zaapi) qui suit la première
+    occurrence de word_pattern dans le texte. None si absent.
+    """
+    for idx, raw in enumerate(tokens):
+        if not is_tag(raw) and word_pattern.search(raw):
+            span = find_highlight_span(tokens, idx + 1)
+            if span is None:
+                return None
+            return "".join(t for t in tokens[span[0] + 1:span[1]] if not is_tag(t)).strip()
+    return None
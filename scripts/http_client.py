@@ -0,0 +1,160 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Python-Automation-Hub/3.0'
+MAX_CONCURRENCY = 6
+POOL_SIZE = 8
+STREAM_CHUNK = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def wire_bytes(response):
+    """
+    Octets du corps réellement reçus sur le réseau (avant décompression gzip/br), corps lu en entier.
+    Repli sur Content-Length, puis sur la taille décodée, si la réponse brute ne les compte pas.
+    """
+    try:
+        return int(response.raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        pass
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else len(response.content)
+
+
+class HttpClient:
+    """
+    Client HTTP commun à tout le trafic sortant (guides Ganymede et hôtes d'images).
+
+    - Connexions gardées ouvertes et réutilisées (pool par hôte).
+    - Compression négociée : gzip/deflate, et br/zstd si le module de décodage est installé.
+    - Au plus max_concurrency requêtes simultanées, tous appelants confondus.
+    - Revalidation : avec revalidate=True, l'ETag / Last-Modified de la dernière réponse 200
+      est renvoyé (If-None-Match / If-Modified-Since) ; une réponse 304 signifie que la copie
+      locale de l'appelant est à jour.
+    """
+
+    def __init__(self, db_path=os.path.join("saves", "http.db"), max_concurrency=MAX_CONCURRENCY,
+                 pool_size=POOL_SIZE):
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self.requests = 0  # Compteurs protégés par _lock (appels depuis plusieurs threads)
+        self.not_modified = 0
+        self.bytes_received = 0
+
+    def get(self, url, timeout=10, revalidate=False, headers=None):
+        """
+        GET complet (corps lu avant de libérer la place de concurrence).
+        Retourne la requests.Response ; les erreurs réseau lèvent les exceptions de requests.
+        """
+        headers = dict(headers or {})
+        if revalidate:
+            headers.update(self._conditional_headers(url))
+
+        with self._slots:
+            response = self.session.get(url, timeout=timeout, headers=headers)
+            response.content  # Lecture complète sous le sémaphore
+
+        if revalidate and response.status_code == 200:
+            self._remember(url, response)
+        with self._lock:
+            self.requests += 1
+            if response.status_code == 304:
+                self.not_modified += 1
+            self.bytes_received += wire_bytes(response)
+        return response
+
+    def iter_content(self, url, timeout=10, chunk_size=STREAM_CHUNK, remember=False):
+        """
+        GET en flux : générateur des morceaux du corps (décodés), à consommer en entier ou à fermer.
+        La place de concurrence est gardée jusqu'à la fin de la lecture.
+        Lève requests.HTTPError si le statut n'est pas 2xx ; remember=True garde l'ETag pour les revalidations.
+        """
+        with self._slots:
+            with self.session.get(url, timeout=timeout, stream=True) as response:
+                with self._lock:
+                    self.requests += 1
+                response.raise_for_status()
+                if remember:
+                    self._remember(url, response)
+                try:
+                    yield from response.iter_content(chunk_size)
+                finally:
+                    # Octets du réseau (compressés), même si le flux est abandonné en route
+                    with self._lock:
+                        self.bytes_received += wire_bytes(response)
+
+    def forget(self, url):
+        """Oublie les validateurs d'une URL (ex : copie locale supprimée)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM validators WHERE url = ?", (url,))
+
+    def stats(self):
+        """bytes : octets reçus sur le réseau (corps compressés), pas la taille décodée."""
+        with self._lock:
+            return {"requests": self.requests, "not_modified": self.not_modified, "bytes": self.bytes_received}
+
+    def close(self):
+        self.session.close()
+        with self._lock:
+            self._conn.close()
+
+    # --- VALIDATEURS ---
+    def _conditional_headers(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT etag, last_modified FROM validators WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def _remember(self, url, response):
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO validators (url, etag, last_modified, updated_at) VALUES (?, ?, ?, ?)",
+                (url, etag, last_modified, time.time()))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_http_client():
+    """Client HTTP commun à toute l'application (créé au premier appel)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpClient()
+        return _shared
@@ -0,0 +1,147 @@
+import gzip
+import json
+import codecs
+
+READ_CHUNK = 64 * 1024
+WHITESPACE = " \t\n\r"
+NUMBER_END = WHITESPACE + ",]}"
+
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    """Texte décodé au fil des morceaux d'octets reçus, consommé depuis pos."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Ajoute au moins un morceau ; False une fois le flux terminé."""
+        if self.eof:
+            return False
+        # La partie déjà consommée est libérée : la mémoire reste bornée par l'élément en cours
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk)
+            if text:
+                self.text += text
+                return True
+        self.text += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return True
+
+    def peek(self):
+        """Prochain caractère significatif (espaces sautés), "" en fin de flux."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON invalide : '{char}' attendu à la position {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Décode la valeur suivante, en lisant davantage tant qu'elle est incomplète."""
+        self.peek()
+        wanted = len(self.text)
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # Un nombre coupé par la fin du tampon ("12" pour "123", "-2." pour "-2.5") paraîtrait complet
+                complete = end < len(self.text) and (not isinstance(value, (int, float))
+                                                     or self.text[end] in NUMBER_END)
+                if complete or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Au moins le double avant de réessayer : coût linéaire même pour une grosse valeur
+            wanted = max(wanted * 2, len(self.text) + 1)
+            while len(self.text) < wanted and self.fill():
+                pass
+
+
+def iter_guide_events(chunks, array_key="steps"):
+    """
+    Décode un objet JSON reçu par morceaux d'octets sans le construire en entier.
+    Produit ("meta", clé, valeur) pour chaque entrée de premier niveau et ("step", index, élément)
+    pour chaque élément du tableau array_key, dès qu'il est complet.
+    Lève ValueError (json.JSONDecodeError) si le contenu est invalide ou tronqué.
+    """
+    buf = _Buffer(chunks)
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+    while True:
+        key = buf.value()
+        if not isinstance(key, str):
+            raise ValueError(f"JSON invalide : clé attendue à la position {buf.pos}")
+        buf.expect(":")
+        if key == array_key and buf.peek() == "[":
+            buf.expect("[")
+            index = 0
+            if buf.peek() == "]":
+                buf.pos += 1
+            else:
+                while True:
+                    yield "step", index, buf.value()
+                    index += 1
+                    if buf.peek() == "]":
+                        buf.pos += 1
+                        break
+                    buf.expect(",")
+        else:
+            yield "meta", key, buf.value()
+        if buf.peek() == "}":
+            buf.pos += 1
+            return
+        buf.expect(",")
+
+
+def iter_file_chunks(path, on_chunk=None, size=READ_CHUNK):
+    """Octets d'un guide sur disque (décompressés si .gz) ; on_chunk reçoit les octets bruts du fichier."""
+    with open(path, "rb") as raw:
+        if path.endswith(".gz"):
+            source = gzip.GzipFile(fileobj=_Tee(raw, on_chunk) if on_chunk else raw)
+        else:
+            source = _Tee(raw, on_chunk) if on_chunk else raw
+        with source:
+            while True:
+                chunk = source.read(size)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class _Tee:
+    """Fichier en lecture dont chaque bloc lu est aussi passé à on_chunk (ex : calcul de hash)."""
+
+    def __init__(self, f, on_chunk):
+        self._f = f
+        self._on_chunk = on_chunk
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        if data:
+            self._on_chunk(data)
+        return data
+
+    def close(self):
+        pass  # Le fichier sous-jacent est fermé par son propriétaire
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
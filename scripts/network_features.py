@@ -1,30 +1,53 @@
 import requests
 import logging
 import json
+from scripts.http_client import shared_http_client
 
 logger = logging.getLogger(__name__)
 
 
+class GuideDownloadError(Exception):
+    """Téléchargement d'un guide impossible ; le message est destiné à l'utilisateur."""
+
+
+def describe_error(e):
+    """Message utilisateur et niveau de log d'une erreur réseau."""
+    if isinstance(e, requests.exceptions.HTTPError):
+        return f"Erreur HTTP : {e.response.status_code} - {e.response.reason}", logging.ERROR
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return "Impossible de joindre le serveur (Problème de connexion).", logging.WARNING
+    if isinstance(e, requests.exceptions.Timeout):
+        return "Le serveur met trop de temps à répondre (Timeout).", logging.WARNING
+    return f"Erreur inattendue : {str(e)}", logging.CRITICAL
+
+
 class NetworkFeatures:
     def __init__(self):
-        # Utilisation d'une session pour garder les connexions actives (Keep-Alive)
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Python-Automation-Hub/3.0'
-        })
+        # Client partagé : connexions gardées ouvertes, compression, revalidation ETag
+        self.http = shared_http_client()
         self.base_url = "https://ganymede-app.com"
 
-    def fetch_guide_data(self, guide_id):
+    def guide_url(self, guide_id):
+        return f"{self.base_url}/guides/{guide_id}/export"
+
+    def fetch_guide_data(self, guide_id, cached=None):
         """
         Télécharge le JSON d'un guide depuis Ganymede via requests.
         Retourne (data, error_message).
+        cached : copie locale du guide ; la requête devient conditionnelle et un 304 la renvoie telle quelle.
         """
-        url = f"{self.base_url}/guides/{guide_id}/export"
+        url = self.guide_url(guide_id)
         logger.info(f"Réseau : Téléchargement du guide {guide_id}...")
 
         try:
             # Timeout de 10s pour la connexion et la lecture
-            response = self.session.get(url, timeout=10)
+            if cached is None:
+                # Pas de copie locale : téléchargement complet, dont on garde l'ETag pour les revalidations
+                self.http.forget(url)
+            response = self.http.get(url, timeout=10, revalidate=True)
+            if response.status_code == 304:
+                logger.info(f"Réseau : Guide {guide_id} inchangé (copie locale à jour).")
+                return cached, None
 
             # Lève une exception si le code HTTP est 4xx ou 5xx
             response.raise_for_status()
@@ -38,19 +61,23 @@ class NetworkFeatures:
                 logger.error(f"Réseau : {err}")
                 return None, err
 
-        except requests.exceptions.HTTPError as e:
-            err = f"Erreur HTTP : {e.response.status_code} - {e.response.reason}"
-            logger.error(f"Réseau : {err}")
-            return None, err
-        except requests.exceptions.ConnectionError:
-            err = "Impossible de joindre le serveur (Problème de connexion)."
-            logger.warning(f"Réseau : {err}")
-            return None, err
-        except requests.exceptions.Timeout:
-            err = "Le serveur met trop de temps à répondre (Timeout)."
-            logger.warning(f"Réseau : {err}")
-            return None, err
         except Exception as e:
-            err = f"Erreur inattendue : {str(e)}"
-            logger.critical(f"Réseau : {err}")
-            return None, err
\ No newline at end of file
+            err, level = describe_error(e)
+            logger.log(level, f"Réseau : {err}")
+            return None, err
+
+    def stream_guide_data(self, guide_id):
+        """
+        Télécharge le JSON d'un guide en flux : générateur de morceaux d'octets, à décoder au fil de l'eau.
+        Lève GuideDownloadError (message lisible) en cas d'échec, y compris en cours de transfert.
+        """
+        url = self.guide_url(guide_id)
+        logger.info(f"Réseau : Téléchargement du guide {guide_id}...")
+        # Téléchargement complet : l'ETag reçu servira aux revalidations
+        self.http.forget(url)
+        try:
+            yield from self.http.iter_content(url, timeout=10, remember=True)
+        except requests.exceptions.RequestException as e:
+            err, level = describe_error(e)
+            logger.log(level, f"Réseau : {err}")
+            raise GuideDownloadError(err) from e
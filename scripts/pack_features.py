@@ -0,0 +1,423 @@
+"""
+Pack hors-ligne de la bibliothèque : un seul fichier indexé pour les guides, les images et la progression.
+
+Usage (depuis la racine du projet, application fermée) :
+    python -m scripts.pack_features export [library.dtpack] [--prune]
+    python -m scripts.pack_features import [library.dtpack] [--force]
+    python -m scripts.pack_features info [library.dtpack]
+
+Un export vers un pack existant n'y ajoute que les contenus nouveaux : ses guides et images absents
+du disque sont conservés, sauf avec --prune (le pack ne garde alors que le contenu local).
+Au démarrage, l'application monte library.dtpack s'il existe et lit directement dedans (mmap)
+ce qui manque sur le disque.
+"""
+import os
+import sys
+import json
+import zlib
+import gzip
+import mmap
+import struct
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# --- FORMAT ---
+# En-tête | blobs adressés par SHA-256 | index JSON compressé (zlib)
+# Une mise à jour ajoute les nouveaux blobs et un nouvel index en fin de fichier, puis réécrit l'en-tête.
+MAGIC = b"DTPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxQQ")  # magic, version, offset de l'index, taille de l'index
+PACK_FILE = "library.dtpack"
+PACK_PREFIX = "pack:"
+PACKED_SAVES = ("progress.db",)
+COMPACT_RATIO = 0.5  # Réécriture complète quand moins de la moitié du fichier est encore utile
+COPY_CHUNK = 1024 * 1024
+
+
+def pack_path(stem, digest):
+    """Chemin virtuel d'un guide du pack ; le hash change avec le contenu (signature de l'index de recherche)."""
+    return f"{PACK_PREFIX}{stem}#{digest[:16]}"
+
+
+def parse_pack_path(path):
+    """Clé du guide d'un chemin virtuel pack:<clé>#<hash>, None pour un chemin disque."""
+    if not path or not path.startswith(PACK_PREFIX):
+        return None
+    return path[len(PACK_PREFIX):].split("#", 1)[0]
+
+
+def is_pack_path(path):
+    return parse_pack_path(path) is not None
+
+
+class LibraryPack:
+    """
+    Lecture d'un pack via mmap : seul l'index est décodé à l'ouverture,
+    chaque guide ou image est lu (copié) au moment où on le demande.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, index_offset, index_size = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Format de pack invalide : {path}")
+            index = json.loads(zlib.decompress(self._mm[index_offset:index_offset + index_size]))
+        except Exception:
+            self.close()
+            raise
+        self.size = len(self._mm)
+        self.blobs = index["blobs"]  # hash -> [offset, taille]
+        self.guides = index["guides"]  # clé -> hash du .json.gz
+        self.assets = index["assets"]  # url -> {"hash", "ext", "variants": {nom: [hash, ext]}}
+        self.files = index["files"]  # nom dans saves/ -> hash
+
+    def read_blob(self, digest):
+        offset, size = self.blobs[digest]
+        return self._mm[offset:offset + size]
+
+    def guide_path(self, stem):
+        digest = self.guides.get(str(stem))
+        return pack_path(stem, digest) if digest else None
+
+    def read_guide(self, stem):
+        """Octets .json.gz du guide, ou None."""
+        digest = self.guides.get(str(stem))
+        return self.read_blob(digest) if digest else None
+
+    def has_asset(self, url):
+        return url in self.assets
+
+    def read_asset(self, url, variant=None):
+        """(extension, octets) de l'image (variante réduite si le pack l'a), ou None."""
+        entry = self.assets.get(url)
+        if entry is None:
+            return None
+        if variant and variant in entry["variants"]:
+            digest, ext = entry["variants"][variant]
+            return ext, self.read_blob(digest)
+        return entry["ext"], self.read_blob(entry["hash"])
+
+    def stats(self):
+        live = sum(size for _, size in self.blobs.values())
+        return {"guides": len(self.guides), "assets": len(self.assets), "files": len(self.files),
+                "blobs": len(self.blobs), "bytes": self.size, "live_bytes": live}
+
+    def close(self):
+        try:
+            if getattr(self, "_mm", None) is not None:
+                self._mm.close()
+            self._file.close()
+        except Exception:
+            pass
+
+
+class PackWriter:
+    """
+    Construit (ou met à jour) un pack. Les entrées du pack existant sont reprises (sauf prune=True)
+    puis remplacées par celles ajoutées ; les blobs déjà présents sont réutilisés sur place,
+    les nouveaux sont mis de côté dans un fichier temporaire jusqu'à commit().
+    """
+
+    def __init__(self, path, prune=False):
+        self.path = path
+        self.blobs = {}  # hash -> ("base", offset, taille) | ("spool", offset, taille)
+        self.guides, self.assets, self.files = {}, {}, {}
+        self.added = 0
+        self._spool = tempfile.TemporaryFile()
+        self._base = None
+        if os.path.exists(path):
+            try:
+                self._base = LibraryPack(path)
+            except Exception as e:
+                logger.warning(f"Pack existant illisible, il sera reconstruit : {e}")
+        if self._base is not None and not prune:
+            self._carry_over()
+
+    def add_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self.blobs:
+            return digest
+        if self._base is not None and digest in self._base.blobs:
+            self.blobs[digest] = ("base", *self._base.blobs[digest])
+        else:
+            offset = self._spool.seek(0, os.SEEK_END)
+            self._spool.write(data)
+            self.blobs[digest] = ("spool", offset, len(data))
+            self.added += 1
+        return digest
+
+    def add_guide(self, stem, gz_data):
+        self.guides[str(stem)] = self.add_blob(gz_data)
+
+    def add_asset(self, url, data, ext, variants=()):
+        self.assets[url] = {"hash": self.add_blob(data), "ext": ext,
+                            "variants": {name: [self.add_blob(vdata), vext] for name, vext, vdata in variants}}
+
+    def add_file(self, name, data):
+        self.files[name] = self.add_blob(data)
+
+    def commit(self):
+        """Écrit le pack : ajout en fin de fichier, ou réécriture complète s'il y a trop de place perdue."""
+        try:
+            live = sum(size for _, _, size in self.blobs.values())
+            spooled = self._spool.seek(0, os.SEEK_END)
+            if self._base is not None and live >= COMPACT_RATIO * (self._base.size + spooled):
+                self._append()
+            else:
+                self._rewrite()
+        finally:
+            self._spool.close()
+            if self._base is not None:
+                self._base.close()
+        return self.added
+
+    # --- INTERNE ---
+    def _carry_over(self):
+        """Reprend guides, images et sauvegardes du pack existant (cas d'une application lancée sur le pack)."""
+        base = self._base
+        for stem, digest in base.guides.items():
+            self.guides[stem] = self._keep(digest)
+        for url, entry in base.assets.items():
+            self.assets[url] = {"hash": self._keep(entry["hash"]), "ext": entry["ext"],
+                                "variants": {name: [self._keep(digest), ext]
+                                             for name, (digest, ext) in entry["variants"].items()}}
+        for name, digest in base.files.items():
+            self.files[name] = self._keep(digest)
+
+    def _keep(self, digest):
+        self.blobs[digest] = ("base", *self._base.blobs[digest])
+        return digest
+
+    def _index(self, offsets):
+        index = {"blobs": offsets, "guides": self.guides, "assets": self.assets, "files": self.files}
+        return zlib.compress(json.dumps(index, separators=(',', ':')).encode('utf-8'), 6)
+
+    def _append(self):
+        start = self._base.size
+        offsets = {}
+        for digest, (where, offset, size) in self.blobs.items():
+            offsets[digest] = [offset if where == "base" else start + offset, size]
+        index = self._index(offsets)
+        self._base.close()  # Le fichier ne doit plus être mappé pendant l'écriture
+        with open(self.path, "r+b") as f:
+            f.seek(start)
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, f, COPY_CHUNK)
+            index_offset = f.tell()
+            f.write(index)
+            f.flush()
+            os.fsync(f.fileno())
+            # L'en-tête en dernier : un arrêt brutal avant laisse l'ancien index valide
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index)))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite(self):
+        tmp_path = self.path + ".tmp"
+        offsets = {}
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+            for digest, (where, offset, size) in self.blobs.items():
+                offsets[digest] = [f.tell(), size]
+                if where == "base":
+                    f.write(self._base.read_blob(digest))
+                else:
+                    self._spool.seek(offset)
+                    f.write(self._spool.read(size))
+            index = self._index(offsets)
+            index_offset = f.tell()
+            f.write(index)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index)))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._base is not None:
+            self._base.close()
+        os.replace(tmp_path, self.path)
+
+
+def open_pack(path=PACK_FILE):
+    """Pack à monter au démarrage, ou None s'il n'existe pas ou est illisible."""
+    if not os.path.exists(path):
+        return None
+    try:
+        pack = LibraryPack(path)
+    except Exception as e:
+        logger.error(f"Pack de bibliothèque illisible ({path}) : {e}")
+        return None
+    stats = pack.stats()
+    logger.info(f"📦 Pack monté : {stats['guides']} guide(s), {stats['assets']} image(s), "
+                f"{stats['bytes'] // 1024} Ko")
+    return pack
+
+
+def export_pack(path, parser_script, assets=None, saves_dir="saves", folder="guides", prune=False):
+    """
+    Exporte la bibliothèque, le cache d'images et la progression. Retourne le nombre de blobs ajoutés.
+    Le contenu local remplace celui du pack ; le reste du pack est conservé sauf avec prune.
+    """
+    from scripts.parser_features import guide_stem
+
+    writer = PackWriter(path, prune=prune)
+    for file_path in parser_script.list_library(folder):
+        if is_pack_path(file_path):
+            continue
+        if file_path.endswith(".gz"):
+            with open(file_path, "rb") as f:
+                data = f.read()
+        else:
+            # Ancien .json : compressé comme dans la bibliothèque
+            guide = parser_script.load_file(file_path)
+            if guide is None:
+                continue
+            data = gzip.compress(json.dumps(guide, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                                 compresslevel=6, mtime=0)
+        writer.add_guide(guide_stem(file_path), data)
+
+    if assets is not None:
+        for url, digest, ext, variants in assets.export_entries():
+            try:
+                with open(assets.blob_path(digest, ext), "rb") as f:
+                    data = f.read()
+                variant_data = []
+                for name, vext in variants:
+                    with open(assets.variant_path(digest, name, vext), "rb") as f:
+                        variant_data.append((name, vext, f.read()))
+            except OSError:
+                continue  # Fichier supprimé hors de l'application
+            writer.add_asset(url, data, ext, variant_data)
+
+    for name in PACKED_SAVES:
+        db_path = os.path.join(saves_dir, name)
+        if os.path.exists(db_path):
+            writer.add_file(name, _snapshot_sqlite(db_path))
+
+    added = writer.commit()
+    logger.info(f"📦 Pack exporté : {len(writer.guides)} guide(s), {len(writer.assets)} image(s), "
+                f"{added} contenu(s) ajouté(s) -> {path}")
+    return added
+
+
+def import_pack(path, parser_script, assets=None, saves_dir="saves", folder="guides", force=False):
+    """
+    Extrait le pack sur le disque. Sans force, ce qui existe déjà localement est conservé.
+    Retourne {"guides": n, "assets": n, "files": n} (éléments écrits).
+    """
+    from scripts.parser_features import LIBRARY_EXT
+
+    pack = LibraryPack(path)
+    counts = {"guides": 0, "assets": 0, "files": 0}
+    try:
+        for stem, digest in pack.guides.items():
+            local = parser_script.find_in_library(stem, folder)
+            if not force and local and not is_pack_path(local):
+                continue
+            _write_atomic(os.path.join(folder, f"{stem}{LIBRARY_EXT}"), pack.read_blob(digest))
+            counts["guides"] += 1
+
+        if assets is not None:
+            for url, entry in pack.assets.items():
+                if not force and assets.contains(url, include_pack=False):
+                    continue
+                variants = [(name, ext, pack.read_blob(digest)) for name, (digest, ext) in entry["variants"].items()]
+                assets.store(url, pack.read_blob(entry["hash"]), variants=variants)
+                counts["assets"] += 1
+
+        for name, digest in pack.files.items():
+            target = os.path.join(saves_dir, name)
+            if os.path.exists(target) and not force:
+                logger.info(f"📦 {name} déjà présent, conservé (--force pour le remplacer).")
+                continue
+            # Journal WAL de l'ancienne base : incompatible avec le fichier importé
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(target + suffix):
+                    os.remove(target + suffix)
+            _write_atomic(target, pack.read_blob(digest))
+            counts["files"] += 1
+    finally:
+        pack.close()
+    logger.info(f"📦 Pack importé : {counts['guides']} guide(s), {counts['assets']} image(s), "
+                f"{counts['files']} sauvegarde(s)")
+    return counts
+
+
+def _snapshot_sqlite(db_path):
+    """Copie cohérente d'une base SQLite (WAL compris), même ouverte ailleurs."""
+    fd, tmp_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        src = sqlite3.connect(db_path)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        with open(tmp_path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(tmp_path)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    from scripts.parser_features import ParserScripts
+    from scripts.asset_cache import AssetCache
+
+    arg_parser = argparse.ArgumentParser(description="Pack hors-ligne de la bibliothèque (guides, images, progression).")
+    arg_parser.add_argument("command", choices=("export", "import", "info"))
+    arg_parser.add_argument("pack", nargs="?", default=PACK_FILE, help=f"fichier pack (défaut : {PACK_FILE})")
+    arg_parser.add_argument("--force", action="store_true", help="import : remplace les fichiers locaux existants")
+    arg_parser.add_argument("--prune", action="store_true",
+                            help="export : retire du pack les guides et images absents du disque")
+    args = arg_parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s : %(message)s',
+                        datefmt='%H:%M:%S')
+    if args.command == "info":
+        if not os.path.exists(args.pack):
+            print(f"Pack introuvable : {args.pack}")
+            return 1
+        pack = LibraryPack(args.pack)
+        stats = pack.stats()
+        pack.close()
+        print(f"{stats['guides']} guide(s), {stats['assets']} image(s), {stats['files']} sauvegarde(s), "
+              f"{stats['blobs']} contenu(s) ; {stats['bytes'] // 1024} Ko dont {stats['live_bytes'] // 1024} Ko utiles")
+        return 0
+
+    parser_script = ParserScripts()
+    assets = AssetCache()
+    try:
+        if args.command == "export":
+            export_pack(args.pack, parser_script, assets, prune=args.prune)
+        else:
+            if not os.path.exists(args.pack):
+                print(f"Pack introuvable : {args.pack}")
+                return 1
+            import_pack(args.pack, parser_script, assets, force=args.force)
+    finally:
+        assets.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
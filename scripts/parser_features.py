@@ -1,14 +1,51 @@
 import json
 import os
 import re
+import gzip
 import logging
+import tempfile
+from scripts.step_store import open_guide_store
+from scripts.step_model import compact_steps
+from scripts.pack_features import parse_pack_path
+from scripts.json_stream import iter_guide_events
 
 logger = logging.getLogger(__name__)
 
+# Bibliothèque compressée : <clé>.json.gz (JSON compact) ; les anciens <clé>.json restent lisibles
+LIBRARY_EXT = ".json.gz"
+LEGACY_EXT = ".json"
+GZIP_LEVEL = 6
+
+
+def is_guide_file(filename):
+    return filename.endswith(LIBRARY_EXT) or filename.endswith(LEGACY_EXT)
+
+
+def _mkstemp_for(file_path):
+    """(descripteur, chemin) d'un fichier temporaire unique à côté de file_path, pour un os.replace atomique."""
+    folder, name = os.path.split(file_path)
+    return tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=folder or ".")
+
+
+def guide_stem(file_path):
+    """Nom d'un fichier de guide sans son extension (.json ou .json.gz), ou clé d'un guide du pack."""
+    stem = parse_pack_path(file_path)
+    if stem is not None:
+        return stem
+    name = os.path.basename(file_path)
+    for ext in (LIBRARY_EXT, LEGACY_EXT):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return os.path.splitext(name)[0]
+
 class ParserScripts:
     def __init__(self):
         # Plus de dépendance logger_func
-        pass
+        # Index de recherche optionnel, mis à jour à chaque archivage de guide
+        self.search_index = None
+        # Pack de bibliothèque monté (lecture seule) : guides absents du disque lus dedans
+        self.pack = None
+        self.pack_folder = "guides"
 
     # --- PARSING & LECTURE ---
 
@@ -22,51 +59,219 @@ class ParserScripts:
             return None
 
     def load_file(self, file_path):
-        """Charge un fichier JSON depuis le disque"""
-        if not os.path.exists(file_path):
+        """Charge un fichier JSON depuis le disque (ou un guide du pack monté)"""
+        stem = parse_pack_path(file_path)
+        if stem is None and not os.path.exists(file_path):
             return None
 
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            if stem is not None:
+                raw = self.pack.read_guide(stem) if self.pack else None
+                return json.loads(gzip.decompress(raw)) if raw else None
+            opener = gzip.open if file_path.endswith(".gz") else open
+            with opener(file_path, 'rt', encoding='utf-8') as f:
                 data = json.load(f)
             return data
         except Exception as e:
             logger.error(f"Parser Erreur lecture : {e}")
             return None
 
+    def load_guide(self, file_path):
+        """
+        Charge un guide via son store binaire mmap (régénéré si le JSON a changé).
+        Les étapes sont décodées à la demande ; repli sur load_file si le store est indisponible,
+        avec des étapes converties en Step compactes (le guide reste ouvert en mémoire).
+        """
+        if parse_pack_path(file_path) is None:
+            if not os.path.exists(file_path):
+                return None
+            data = open_guide_store(file_path, self)
+            if data is not None:
+                return data
+        # Guide du pack (lu dans son mmap, sans store binaire) ou store indisponible
+        data = self.load_file(file_path)
+        if isinstance(data, dict) and isinstance(data.get("steps"), list):
+            data["steps"] = compact_steps(data["steps"])
+        return data
+
     # --- ÉCRITURE & SAUVEGARDE ---
 
-    def save_file(self, file_path, data):
-        """Sauvegarde un dictionnaire en JSON sur le disque"""
+    def save_file(self, file_path, data, indent=4):
+        """
+        Sauvegarde un dictionnaire en JSON sur le disque.
+        Écriture atomique (fichier temporaire + fsync + rename) : un crash ne laisse jamais un fichier tronqué.
+        Un chemin en .gz est écrit en JSON compact compressé (indent ignoré).
+        """
+        tmp_path = None
         try:
             # Création du dossier parent si inexistant
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            compressed = file_path.endswith(".gz")
+            if compressed:
+                payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            # Nom temporaire unique : deux écritures du même fichier ne partagent jamais leur brouillon
+            fd, tmp_path = _mkstemp_for(file_path)
 
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            if compressed:
+                with os.fdopen(fd, 'wb') as f:
+                    # mtime=0 : même guide, mêmes octets (hash du store binaire stable)
+                    with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as gz:
+                        gz.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+            else:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=indent, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
             return True
         except Exception as e:
             logger.error(f"Erreur sauvegarde : {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
             return False
 
     def save_guide_to_library(self, data, folder="guides"):
-        """Sauvegarde une copie propre du guide dans le dossier bibliothèque"""
+        """Sauvegarde une copie propre (compressée) du guide dans le dossier bibliothèque"""
         guide_id = data.get("id")
         name = data.get("name", "guide_inconnu")
 
         if guide_id:
-            safe_filename = f"{guide_id}.json"
+            stem = str(guide_id)
         else:
-            safe_name = re.sub(r'[<>:"/\\|?*]', '', name).strip().replace(' ', '_').lower()
-            safe_filename = f"{safe_name}.json"
+            stem = re.sub(r'[<>:"/\\|?*]', '', name).strip().replace(' ', '_').lower()
+        safe_filename = f"{stem}{LIBRARY_EXT}"
 
         full_path = os.path.join(folder, safe_filename)
 
         if self.save_file(full_path, data):
             logger.info(f"📚 Guide archivé : {safe_filename}")
+            self._remove_legacy(os.path.join(folder, f"{stem}{LEGACY_EXT}"))
+            if self.search_index:
+                try:
+                    self.search_index.index_guide(data, full_path)
+                except Exception as e:
+                    logger.error(f"Erreur indexation {safe_filename} : {e}")
             return full_path
         return None
 
+    def stream_guide_to_library(self, chunks, stem, folder="guides"):
+        """
+        Archive un guide reçu par morceaux d'octets JSON (ex : téléchargement en flux) tout en le décodant.
+        Générateur des événements de iter_guide_events : ("meta", clé, valeur) / ("step", index, étape).
+        Le fichier n'est mis en place et indexé qu'une fois le flux complet et valide, puis ("saved", chemin, None).
+        """
+        full_path = os.path.join(folder, f"{stem}{LIBRARY_EXT}")
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = _mkstemp_for(full_path)
+
+        def tee(f):
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                # Octets reçus compressés tels quels : pas de re-sérialisation
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as gz:
+                    yield from iter_guide_events(tee(gz))
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            # Flux interrompu, invalide ou abandonné : rien n'entre dans la bibliothèque
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise
+
+        logger.info(f"📚 Guide archivé : {os.path.basename(full_path)}")
+        self._remove_legacy(os.path.join(folder, f"{stem}{LEGACY_EXT}"))
+        if self.search_index:
+            try:
+                self.search_index.index_guide(self.load_guide(full_path), full_path)
+            except Exception as e:
+                logger.error(f"Erreur indexation {os.path.basename(full_path)} : {e}")
+        yield "saved", full_path, None
+
+    # --- BIBLIOTHÈQUE ---
+
+    def mount_pack(self, pack, folder="guides"):
+        """Complète la bibliothèque folder avec les guides du pack (le disque reste prioritaire)."""
+        self.pack = pack
+        self.pack_folder = folder
+
+    def find_in_library(self, stem, folder="guides"):
+        """Chemin du guide <stem> dans la bibliothèque (compressé, ancien .json, puis pack monté), ou None."""
+        for ext in (LIBRARY_EXT, LEGACY_EXT):
+            path = os.path.join(folder, f"{stem}{ext}")
+            if os.path.exists(path):
+                return path
+        if self.pack is not None and folder == self.pack_folder:
+            return self.pack.guide_path(stem)
+        return None
+
+    def list_library(self, folder="guides"):
+        """Fichiers de guides de la bibliothèque, un par guide (la version compressée l'emporte)."""
+        paths = {}
+        for filename in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if is_guide_file(filename):
+                stem = guide_stem(filename)
+                if stem not in paths or filename.endswith(LIBRARY_EXT):
+                    paths[stem] = os.path.join(folder, filename)
+        if self.pack is not None and folder == self.pack_folder:
+            for stem in self.pack.guides:
+                paths.setdefault(stem, self.pack.guide_path(stem))
+        return [paths[stem] for stem in sorted(paths)]
+
+    def resolve_guide_path(self, path):
+        """
+        Chemin actuel d'un guide mémorisé (session, onglets ouverts) : ancien .json devenu .json.gz,
+        guide disponible seulement dans le pack, ou guide du pack remplacé par une copie disque.
+        """
+        if not path:
+            return path
+        stem = parse_pack_path(path)
+        if stem is not None:
+            return self.find_in_library(stem, self.pack_folder) or path
+        if os.path.exists(path):
+            return path
+        return self.find_in_library(guide_stem(path), os.path.dirname(path) or ".") or path
+
+    def guide_exists(self, path):
+        stem = parse_pack_path(path)
+        if stem is not None:
+            return self.pack is not None and self.pack.guide_path(stem) == path
+        return bool(path) and os.path.exists(path)
+
+    def compress_library(self, folder="guides"):
+        """Convertit les anciens guides .json de la bibliothèque au format compressé."""
+        converted = 0
+        for path in self.list_library(folder):
+            if not path.endswith(LEGACY_EXT):
+                continue
+            data = self.load_file(path)
+            if data is not None and self.save_file(path + ".gz", data):
+                self._remove_legacy(path)
+                converted += 1
+        if converted:
+            logger.info(f"📚 Bibliothèque : {converted} guide(s) compressé(s).")
+        return converted
+
+    def _remove_legacy(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Ancien fichier non supprimé ({path}) : {e}")
+
     # --- NAVIGATION ET UTILITAIRES ---
 
     def get_steps_list(self, data):
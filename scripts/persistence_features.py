@@ -0,0 +1,68 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindWriter:
+    """
+    Persistance différée : les écritures sont regroupées par clé (chemin) et vidées
+    par un thread de fond au plus une fois par intervalle. Seule la dernière valeur
+    programmée pour une clé est écrite.
+    batch_func, si fourni, reçoit tout le lot en un appel (ex : une transaction SQLite).
+    """
+
+    def __init__(self, write_func=None, interval=1.0, batch_func=None):
+        self.write_func = write_func  # (key, data) -> bool
+        self.batch_func = batch_func  # (dict) -> None
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stopped = threading.Event()
+        self.flush_count = 0
+
+        self._thread = threading.Thread(target=self._run, name="WriteBehind", daemon=True)
+        self._thread.start()
+
+    def schedule(self, key, data):
+        """Programme l'écriture de data (snapshot déjà détaché de l'état vivant)."""
+        with self._lock:
+            self._pending[key] = data
+        self._dirty.set()
+
+    def flush(self):
+        """Écrit immédiatement tout ce qui est en attente (appel synchrone)."""
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            self.flush_count += 1
+            if self.batch_func:
+                try:
+                    self.batch_func(batch)
+                except Exception as e:
+                    logger.error(f"Persistance : échec d'écriture du lot ({len(batch)} élément(s)) : {e}")
+                return
+            for key, data in batch.items():
+                try:
+                    self.write_func(key, data)
+                except Exception as e:
+                    logger.error(f"Persistance : échec d'écriture de {key} : {e}")
+
+    def shutdown(self, timeout=2.0):
+        """Arrête le thread de fond et vide la file (à appeler à la fermeture)."""
+        self._stopped.set()
+        self._dirty.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._dirty.wait()
+            # Fenêtre de coalescence : les mutations arrivant pendant ce délai partagent la même écriture
+            self._stopped.wait(self.interval)
+            self._dirty.clear()
+            self.flush()
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS session (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS progress (
+    guide_key TEXT PRIMARY KEY,
+    guide_id TEXT,
+    guide_name TEXT,
+    current_idx INTEGER NOT NULL DEFAULT 0,
+    last_updated TEXT
+);
+CREATE TABLE IF NOT EXISTS step_history (
+    id INTEGER PRIMARY KEY,
+    guide_key TEXT NOT NULL,
+    step_idx INTEGER NOT NULL,
+    visited_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_guide ON step_history (guide_key, visited_at);
+CREATE TABLE IF NOT EXISTS checkboxes (
+    guide_key TEXT NOT NULL,
+    cb_key TEXT NOT NULL,
+    checked INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (guide_key, cb_key)
+);
+"""
+
+
+class ProgressStore:
+    """
+    Stockage SQLite (mode WAL) de la session, de la progression par guide,
+    de l'historique des étapes et de l'état des cases à cocher.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- ÉCRITURES (appelées par le thread de persistance) ---
+
+    def apply_batch(self, batch):
+        """
+        Applique un lot d'opérations en une seule transaction.
+        batch : dict {(type, ...): data} tel que produit par WriteBehindWriter.
+        """
+        with self._lock, self._conn:
+            for key, data in batch.items():
+                kind = key[0]
+                if kind == "session":
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO session (key, value) VALUES (?, ?)",
+                        [(k, json.dumps(v, ensure_ascii=False)) for k, v in data.items()])
+                elif kind == "progress":
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO progress (guide_key, guide_id, guide_name, current_idx, last_updated) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key[1], _as_text(data["guide_id"]), data["guide_name"], data["current_idx"],
+                         data["last_updated"]))
+                elif kind == "history":
+                    self._conn.execute(
+                        "INSERT INTO step_history (guide_key, step_idx, visited_at) VALUES (?, ?, ?)",
+                        (key[1], data["step_idx"], data["visited_at"]))
+                elif kind == "checkbox":
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO checkboxes (guide_key, cb_key, checked, updated_at) VALUES (?, ?, ?, ?)",
+                        (key[1], key[2], int(bool(data)), time.time()))
+
+    # --- LECTURES ---
+
+    def get_progress(self, guide_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT current_idx FROM progress WHERE guide_key = ?", (guide_key,)).fetchone()
+        return row[0] if row else None
+
+    def get_all_progress(self):
+        """Progression de toute la bibliothèque en une seule requête : {guide_key: current_idx}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT guide_key, current_idx FROM progress").fetchall()
+        return dict(rows)
+
+    def get_checkboxes(self, guide_key):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cb_key, checked FROM checkboxes WHERE guide_key = ?", (guide_key,)).fetchall()
+        return {k: bool(v) for k, v in rows}
+
+    def get_history(self, guide_key, limit=100):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT step_idx, visited_at FROM step_history WHERE guide_key = ? "
+                "ORDER BY visited_at DESC LIMIT ?", (guide_key, limit)).fetchall()
+
+    def load_session(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM session").fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    # --- MIGRATION ---
+
+    def migrate_json_saves(self, saves_dir, session_filename="session.json"):
+        """Import unique des anciens fichiers saves/*.json (session + progression par guide)."""
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done or not os.path.isdir(saves_dir):
+            return
+
+        batch = {}
+        count = 0
+        for filename in os.listdir(saves_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(saves_dir, filename)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.warning(f"Migration : fichier ignoré {filename} ({e})")
+                continue
+            if not isinstance(data, dict):
+                continue
+            if filename == session_filename:
+                batch[("session",)] = data
+            elif "current_idx" in data:
+                key = os.path.splitext(filename)[0]
+                batch[("progress", key)] = {
+                    "guide_id": data.get("guide_id"),
+                    "guide_name": data.get("guide_name"),
+                    "current_idx": data.get("current_idx", 0),
+                    "last_updated": data.get("last_updated")
+                }
+                count += 1
+
+        self.apply_batch(batch)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                               (time.strftime("%Y-%m-%d %H:%M:%S"),))
+        logger.info(f"🗃️ Migration JSON -> SQLite terminée ({count} progression(s)).")
+
+
+def _as_text(value):
+    return None if value is None else str(value)
@@ -0,0 +1,236 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import logging
+
+from scripts.guide_compiler import TAG_PATTERN
+from scripts.parser_features import guide_stem
+from scripts.pack_features import is_pack_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2  # 2 : FTS5 (1 : postings calculés en Python, reconstruit à l'ouverture)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guides (
+    guide_key TEXT PRIMARY KEY,
+    guide_id TEXT,
+    name TEXT,
+    file TEXT,
+    signature TEXT
+);
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    guide_key TEXT NOT NULL,
+    step_idx INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_guide ON docs (guide_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS steps_fts USING fts5(
+    body, entities, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS names_fts USING fts5(
+    name, guide_key UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+LEGACY_TABLES = ("postings", "docs", "meta", "guides")
+
+WORD_PATTERN = re.compile(r'\w+')
+ENTITY_PATTERN = re.compile(r'<span[^>]*class="[^"]*tag-\w+[^"]*"[^>]*>(.*?)</span>', re.DOTALL)
+STOPWORDS = {
+    "le", "la", "les", "de", "des", "du", "un", "une", "et", "en", "au", "aux", "pour", "par", "sur",
+    "dans", "ce", "ces", "est", "il", "elle", "vous", "se", "sa", "son", "ses", "qui", "que", "pas",
+    "ne", "avec", "puis", "ou", "votre", "vos", "si", "the"
+}
+
+# Pondérations : entités taguées (monstres, objets, quêtes...) et nom du guide
+ENTITY_WEIGHT = 3.0
+NAME_WEIGHT = 2.0
+# Étapes lues par requête FTS5 : un mot très courant n'oblige pas à scorer toute la bibliothèque
+MAX_SCANNED = 3000
+
+
+def tokenize(text):
+    """Minuscules, sans accents, mots de 2 caractères ou plus hors mots vides."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w for w in WORD_PATTERN.findall(text) if len(w) > 1 and w not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    Index plein texte persistant (SQLite FTS5) sur le texte des étapes et les entités taguées tag-*,
+    nom des guides indexé une fois par guide et ajouté en bonus au moment de la requête.
+    Classement bm25 calculé par SQLite, dernier mot traité en préfixe (recherche à la frappe).
+    Les recherches passent par leur propre connexion (WAL) : elles n'attendent pas une indexation en cours.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._read_lock = threading.Lock()
+        self._reader = sqlite3.connect(db_path, check_same_thread=False)
+
+    def close(self):
+        with self._read_lock:
+            self._reader.close()
+        with self._lock:
+            self._conn.close()
+
+    def _migrate(self):
+        """Ancien index (postings calculés en Python) : supprimé, la bibliothèque sera réindexée."""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        for table in LEGACY_TABLES:
+            self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+
+    # --- INDEXATION ---
+
+    def _guide_key(self, data, file_path):
+        gid = data.get("id")
+        return str(gid) if gid else guide_stem(file_path)
+
+    def _signature(self, file_path):
+        if is_pack_path(file_path):
+            return file_path  # Contient le hash du contenu
+        st = os.stat(file_path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _step_columns(self, web_text):
+        """(texte, entités) d'une étape, sans balises ; le tokenizer FTS5 gère casse et accents."""
+        body = TAG_PATTERN.sub(' ', web_text)
+        entities = " ".join(TAG_PATTERN.sub(' ', entity) for entity in ENTITY_PATTERN.findall(web_text))
+        return body, entities
+
+    def index_guide(self, data, file_path):
+        """(Ré)indexe un guide complet : ses anciennes entrées sont remplacées."""
+        key = self._guide_key(data, file_path)
+        name = data.get("name", key)
+        signature = self._signature(file_path) if is_pack_path(file_path) or os.path.exists(file_path) else ""
+
+        docs = [self._step_columns(step.get("web_text") or "") for step in data.get("steps", [])]
+
+        with self._lock, self._conn:
+            self._remove_guide_locked(key)
+            self._conn.execute("INSERT INTO guides (guide_key, guide_id, name, file, signature) "
+                               "VALUES (?, ?, ?, ?, ?)",
+                               (key, str(data.get("id")) if data.get("id") else None, name, file_path, signature))
+            self._conn.execute("INSERT INTO names_fts (name, guide_key) VALUES (?, ?)", (name, key))
+            for step_idx, (body, entities) in enumerate(docs):
+                cur = self._conn.execute("INSERT INTO docs (guide_key, step_idx) VALUES (?, ?)", (key, step_idx))
+                self._conn.execute("INSERT INTO steps_fts (rowid, body, entities) VALUES (?, ?, ?)",
+                                   (cur.lastrowid, body, entities))
+        logger.info(f"🔎 Index : {name} ({len(docs)} étapes)")
+
+    def remove_guide(self, guide_key):
+        with self._lock, self._conn:
+            self._remove_guide_locked(guide_key)
+
+    def _remove_guide_locked(self, key):
+        self._conn.execute("DELETE FROM steps_fts WHERE rowid IN (SELECT doc_id FROM docs WHERE guide_key = ?)",
+                           (key,))
+        self._conn.execute("DELETE FROM docs WHERE guide_key = ?", (key,))
+        self._conn.execute("DELETE FROM names_fts WHERE guide_key = ?", (key,))
+        self._conn.execute("DELETE FROM guides WHERE guide_key = ?", (key,))
+
+    def is_up_to_date(self, file_path):
+        with self._lock:
+            row = self._conn.execute("SELECT signature FROM guides WHERE file = ?", (file_path,)).fetchone()
+        try:
+            return bool(row) and row[0] == self._signature(file_path)
+        except OSError:
+            return False
+
+    def index_library(self, parser_script, folder="guides"):
+        """Indexation incrémentale de la bibliothèque : seuls les guides nouveaux ou modifiés sont relus."""
+        updated = 0
+        for path in parser_script.list_library(folder):
+            if self.is_up_to_date(path):
+                continue
+            data = parser_script.load_file(path)
+            if data:
+                self.index_guide(data, path)
+                updated += 1
+        if updated:
+            logger.info(f"🔎 Index à jour ({updated} guide(s) réindexé(s)).")
+        return updated
+
+    # --- RECHERCHE ---
+
+    def _match_queries(self, terms):
+        """Requêtes FTS5, dernier mot en préfixe : tous les mots d'abord (ET), puis un seul suffit (OU)."""
+        phrases = [f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*']
+        if len(phrases) == 1:
+            return phrases
+        return [" ".join(phrases), " OR ".join(phrases)]
+
+    def _scan_steps(self, match, scored):
+        """Scores bm25 (positifs) des étapes trouvées, au plus MAX_SCANNED lues."""
+        rows = self._reader.execute(
+            "SELECT rowid, -bm25(steps_fts, 1.0, ?) FROM steps_fts WHERE steps_fts MATCH ? LIMIT ?",
+            (ENTITY_WEIGHT - 1, match, MAX_SCANNED))
+        for doc_id, score in rows:
+            scored.setdefault(doc_id, score)
+
+    def search(self, query, limit=20):
+        """
+        Retourne les meilleures étapes : liste de dicts
+        {guide_key, guide_id, name, file, step_idx, score}.
+        Un guide trouvé par son seul nom est proposé à sa première étape.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        queries = self._match_queries(terms)
+
+        with self._read_lock:
+            # bm25() est négatif (plus petit = meilleur) : les scores sont renvoyés positifs
+            named = dict(self._reader.execute(
+                "SELECT guide_key, -bm25(names_fts) FROM names_fts WHERE names_fts MATCH ?",
+                (queries[-1],)).fetchall())
+            by_doc = {}
+            for match in queries:
+                self._scan_steps(match, by_doc)
+                if len(by_doc) >= limit:
+                    break  # Assez d'étapes contenant tous les mots
+
+            best_docs = sorted(by_doc.items(), key=lambda kv: kv[1], reverse=True)[:limit * 2]
+            scored = {}
+            if best_docs:
+                marks = ",".join("?" * len(best_docs))
+                doc_scores = dict(best_docs)
+                for doc_id, key, step_idx in self._reader.execute(
+                        f"SELECT doc_id, guide_key, step_idx FROM docs WHERE doc_id IN ({marks})",
+                        [doc_id for doc_id, _ in best_docs]):
+                    scored[(key, step_idx)] = doc_scores[doc_id] + NAME_WEIGHT * named.get(key, 0.0)
+            found = {key for key, _ in scored}
+            for key, score in named.items():
+                if key not in found:
+                    scored[(key, 0)] = NAME_WEIGHT * score
+
+            best = sorted(scored.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+            keys = list({key for (key, _), _ in best})
+            guides = {}
+            if keys:
+                marks = ",".join("?" * len(keys))
+                for row in self._reader.execute(
+                        f"SELECT guide_key, guide_id, name, file FROM guides WHERE guide_key IN ({marks})", keys):
+                    guides[row[0]] = row
+
+        hits = []
+        for (key, step_idx), score in best:
+            row = guides.get(key)
+            if row:
+                hits.append({"guide_key": key, "guide_id": row[1], "name": row[2], "file": row[3],
+                             "step_idx": step_idx, "score": score})
+        return hits
@@ -2,20 +2,40 @@ import os
 import time
 import re
 import logging
+import threading
+import itertools
+from scripts.guide_compiler import GuideCompiler, EMPTY_ACTION
+from scripts.persistence_features import WriteBehindWriter
+from scripts.progress_store import ProgressStore
+from scripts.guide_registry import GuideRegistry, MEMORY_BUDGET, payload_bytes
+from scripts.step_model import compact_steps
 
 logger = logging.getLogger(__name__)
 
 
 class SessionFeatures:
-    def __init__(self, parser_script, saves_dir="saves"):
+    def __init__(self, parser_script, saves_dir="saves", flush_interval=1.0, memory_budget=MEMORY_BUDGET):
         self.parser = parser_script
+        self.compiler = GuideCompiler(parser_script)
         self.saves_dir = saves_dir
-        self.session_file = os.path.join(saves_dir, "session.json")
-        self.open_guides = []
+        self.session_file = os.path.join(saves_dir, "session.json")  # Ancien format, migré au démarrage
+        self.registry = GuideRegistry()
         self.active_index = -1
+        # Au-delà, les étapes des onglets inactifs les plus anciens sont libérées (relues à l'activation)
+        self.memory_budget = memory_budget
         # Caches
         self.last_char_name = ""
         self.last_ocr_zone = None  # (x, y, w, h)
+        self._hydrate_lock = threading.Lock()
+        self._history_seq = itertools.count()
+        # Versions des cases à cocher (clé du cache de rendu de GuidePanel) :
+        # une par onglet ouvert, puis une par étape à chaque case cochée
+        self._checkbox_seq = itertools.count(1)
+        # Session, progression et cases à cocher dans une base SQLite (WAL)
+        self.store = ProgressStore(os.path.join(saves_dir, "progress.db"))
+        self.store.migrate_json_saves(saves_dir, os.path.basename(self.session_file))
+        # Écritures différées et regroupées en une transaction (hors thread UI)
+        self.writer = WriteBehindWriter(batch_func=self.store.apply_batch, interval=flush_interval)
 
     # --- GESTION PREFERENCES ---
 
@@ -36,14 +56,23 @@ class SessionFeatures:
 
     # --- GESTION LISTE GUIDES ---
 
+    @property
+    def open_guides(self):
+        """Onglets dans l'ordre d'affichage (liste tenue par le registre)."""
+        return self.registry.guides
+
     def add_guide(self, name, steps, filename="", guide_id=None):
-        for i, guide in enumerate(self.open_guides):
-            if (guide_id and str(guide.get('id')) == str(guide_id)) or \
-                    (not guide_id and guide['name'] == name):
-                logger.info(f"Guide existant, focus onglet {i + 1}.")
-                self.active_index = i
-                self.save_session_to_disk()
-                return i
+        steps = self._compact(steps)
+        i = self.registry.find(guide_id, name)
+        if i >= 0:
+            guide = self.open_guides[i]
+            logger.info(f"Guide existant, focus onglet {i + 1}.")
+            if not self.is_hydrated(guide):
+                self._attach_steps(guide, steps)
+            self.active_index = i
+            self.enforce_memory_budget()
+            self.save_session_to_disk()
+            return i
 
         unique_key = guide_id if guide_id else name
         start_idx = self._load_progress_index(unique_key)
@@ -52,17 +81,22 @@ class SessionFeatures:
             'name': name,
             'id': guide_id,
             'steps': steps,
+            'actions': self.compiler.compile_steps(steps),
             'current_idx': start_idx,
-            'file': filename
+            'file': filename,
+            'checkboxes': self.store.get_checkboxes(self._progress_key(unique_key)),
+            'checkbox_version': next(self._checkbox_seq)
         }
-        self.open_guides.append(new_guide)
-        self.active_index = len(self.open_guides) - 1
+        new_guide['payload_bytes'] = payload_bytes(steps)
+        self.active_index = self.registry.append(new_guide)
+        self.registry.touch(new_guide)
+        self.enforce_memory_budget()
         self.save_session_to_disk()
         return self.active_index
 
     def remove_guide(self, index):
         if 0 <= index < len(self.open_guides):
-            del self.open_guides[index]
+            self.registry.remove(index)
             if index == self.active_index:
                 self.active_index = max(0, len(self.open_guides) - 1)
             elif index < self.active_index:
@@ -71,55 +105,228 @@ class SessionFeatures:
             self.save_session_to_disk()
 
     def get_active_guide(self):
+        if 0 <= self.active_index < len(self.open_guides):
+            guide = self.open_guides[self.active_index]
+            self.registry.touch(guide)
+            if not self.is_hydrated(guide):
+                self.hydrate_guide(guide)
+                self.enforce_memory_budget()
+            return guide
+        return None
+
+    # --- HYDRATATION PARESSEUSE ---
+
+    def restore_tabs(self, entries, active_idx):
+        """
+        Recrée les onglets de la session sous forme de placeholders légers (sans étapes).
+        Aucune écriture disque : l'état restauré est déjà celui du fichier de session.
+        """
+        saved_progress = None
+        for entry in entries:
+            path = self.parser.resolve_guide_path(entry.get('file_path'))
+            if not self.parser.guide_exists(path):
+                continue
+            gid, name = entry.get('id'), entry.get('name')
+            key = self._progress_key(gid if gid else name)
+            current_idx = entry.get('current_idx')
+            if current_idx is None:
+                if saved_progress is None:
+                    saved_progress = self.store.get_all_progress()
+                current_idx = saved_progress.get(key, 0)
+            self.registry.append({
+                'name': name,
+                'id': gid,
+                'steps': None,
+                'actions': None,
+                'current_idx': current_idx,
+                'file': path,
+                'checkboxes': self.store.get_checkboxes(key),
+                'checkbox_version': next(self._checkbox_seq)
+            })
+        if 0 <= active_idx < len(self.open_guides):
+            self.active_index = active_idx
+        elif self.open_guides:
+            self.active_index = 0
+
+    def is_hydrated(self, guide):
+        return guide.get('steps') is not None
+
+    def hydrate_guide(self, guide):
+        """Charge les étapes d'un onglet placeholder depuis son fichier."""
+        with self._hydrate_lock:
+            if self.is_hydrated(guide):
+                return True
+            guide['file'] = self.parser.resolve_guide_path(guide['file'])
+            data = self.parser.load_guide(guide['file'])
+            steps = self.parser.get_steps_list(data) if data else []
+            if not steps:
+                logger.error(f"Hydratation impossible pour '{guide['name']}' ({guide['file']})")
+            self._attach_steps(guide, steps)
+            return bool(steps)
+
+    def replace_guide_steps(self, guide_id, name, steps, path=None):
+        """
+        Installe une nouvelle version d'un guide dans ses onglets ouverts.
+        current_idx (borné) et cases cochées sont conservés ; la nouvelle version de cases
+        invalide les pages déjà rendues. Retourne les onglets mis à jour.
+        """
+        steps = self._compact(steps)
+        updated = []
+        with self._hydrate_lock:
+            for guide in self.open_guides:
+                if not guide_id or str(guide.get('id')) != str(guide_id):
+                    continue
+                if name and name != guide['name']:
+                    self.registry.rename(guide, name)
+                guide['file'] = path or guide['file']
+                # Un placeholder sera hydraté depuis le fichier, déjà remplacé
+                if self.is_hydrated(guide):
+                    self._attach_steps(guide, steps)
+                guide['checkbox_version'] = next(self._checkbox_seq)
+                guide.pop('step_checkbox_versions', None)
+                updated.append(guide)
+        if updated:
+            self.enforce_memory_budget()
+            self.save_session_to_disk()
+        return updated
+
+    def get_pending_guides(self):
+        """Onglets encore à l'état de placeholder."""
+        return [g for g in self.open_guides if not self.is_hydrated(g)]
+
+    # --- BUDGET MÉMOIRE ---
+
+    def inactive_payload_bytes(self):
+        """Mémoire estimée des étapes chargées des onglets inactifs."""
+        active = self._active_tab()
+        return sum(g.get('payload_bytes', 0) for g in self.open_guides if g is not active and self.is_hydrated(g))
+
+    def has_memory_budget(self):
+        """Vrai s'il reste de la place pour hydrater un onglet inactif de plus (hydratation de fond)."""
+        return self.inactive_payload_bytes() < self.memory_budget
+
+    def enforce_memory_budget(self):
+        """
+        Libère les étapes des onglets inactifs les moins récemment affichés jusqu'à revenir dans le budget.
+        Seuls restent nom, fichier, current_idx et cases cochées : l'onglet redevient un placeholder,
+        rehydraté depuis son fichier à sa prochaine activation. Retourne le nombre d'onglets libérés.
+        """
+        released = 0
+        with self._hydrate_lock:
+            active = self._active_tab()
+            total = self.inactive_payload_bytes()
+            for guide in self.registry.eviction_candidates(active):
+                if total <= self.memory_budget:
+                    break
+                # Guide en cours de téléchargement : son fichier n'existe pas encore
+                if not guide['file'] or not self.parser.guide_exists(guide['file']):
+                    continue
+                total -= guide.get('payload_bytes', 0)
+                guide['steps'] = None
+                guide['actions'] = None
+                guide['payload_bytes'] = 0
+                released += 1
+                logger.info(f"💤 Onglet '{guide['name']}' déchargé (budget mémoire), rechargé à l'activation.")
+        return released
+
+    def _active_tab(self):
         if 0 <= self.active_index < len(self.open_guides):
             return self.open_guides[self.active_index]
         return None
 
+    @staticmethod
+    def _compact(steps):
+        """Liste de dicts JSON bruts -> Step compactes ; store binaire et flux en cours gardés tels quels."""
+        return compact_steps(steps) if isinstance(steps, list) else steps
+
+    def _attach_steps(self, guide, steps):
+        # Les actions d'abord : un onglet n'est considéré hydraté qu'une fois 'steps' posé
+        guide['actions'] = self.compiler.compile_steps(steps)
+        if guide['current_idx'] >= len(steps):
+            guide['current_idx'] = max(0, len(steps) - 1)
+        guide['payload_bytes'] = payload_bytes(steps)
+        guide['steps'] = steps
+
+    def get_step_action(self, guide, index):
+        """Lecture O(1) des métadonnées précompilées d'une étape."""
+        actions = guide.get('actions') if guide else None
+        if actions and 0 <= index < len(actions):
+            return actions[index]
+        return EMPTY_ACTION
+
     def set_active_index(self, index):
         if 0 <= index < len(self.open_guides):
             self.active_index = index
+            self.enforce_memory_budget()
             self.save_session_to_disk()
 
     # --- IO ---
 
-    def _get_progression_path(self, identifier):
+    def _progress_key(self, identifier):
+        # Même clé que l'ancien nom de fichier saves/<clé>.json (compatibilité migration)
         if str(identifier).isdigit():
-            return os.path.join(self.saves_dir, f"{identifier}.json")
-        safe_name = re.sub(r'[<>:"/\\|?*]', '', str(identifier)).replace(' ', '_').lower()
-        return os.path.join(self.saves_dir, f"{safe_name}.json")
+            return str(identifier)
+        return re.sub(r'[<>:"/\\|?*]', '', str(identifier)).replace(' ', '_').lower()
+
+    def _guide_key(self, guide):
+        return self._progress_key(guide['id'] if guide['id'] else guide['name'])
 
     def _load_progress_index(self, identifier):
-        path = self._get_progression_path(identifier)
-        data = self.parser.load_file(path)
-        return data.get("current_idx", 0) if data else 0
+        idx = self.store.get_progress(self._progress_key(identifier))
+        return idx if idx is not None else 0
+
+    def load_all_progress(self):
+        """Progression de toute la bibliothèque : {clé guide: current_idx}."""
+        return self.store.get_all_progress()
+
+    def save_checkbox_state(self, guide, cb_key, checked):
+        if not guide: return
+        guide.setdefault('checkboxes', {})[cb_key] = checked
+        # Seule l'étape de la case change : les pages voisines préchargées restent valides
+        step_id = cb_key.rsplit('_', 1)[0]
+        guide.setdefault('step_checkbox_versions', {})[step_id] = next(self._checkbox_seq)
+        self.writer.schedule(("checkbox", self._guide_key(guide), cb_key), checked)
 
     def find_guide_in_library(self, guide_id):
-        expected_path = os.path.join("guides", f"{guide_id}.json")
-        return expected_path if os.path.exists(expected_path) else None
+        return self.parser.find_in_library(guide_id)
 
     def save_current_progress(self):
         guide = self.get_active_guide()
         if not guide: return
-        unique_key = guide['id'] if guide['id'] else guide['name']
+        key = self._guide_key(guide)
         data = {
             "guide_id": guide['id'],
             "guide_name": guide['name'],
             "current_idx": guide['current_idx'],
             "last_updated": time.strftime("%Y-%m-%d %H:%M:%S")
         }
-        self.parser.save_file(self._get_progression_path(unique_key), data)
+        self.writer.schedule(("progress", key), data)
+        # Historique : une entrée par passage (clé unique, donc jamais fusionnée)
+        self.writer.schedule(("history", key, next(self._history_seq)),
+                             {"step_idx": guide['current_idx'], "visited_at": time.time()})
+        # La session garde aussi l'index courant de chaque onglet (restauration en placeholder)
+        self.save_session_to_disk()
 
     def save_session_to_disk(self):
         session_data = {
             "character_name": self.last_char_name,
             "ocr_zone": self.last_ocr_zone,  # Sauvegarde de la zone
             "active_tab": self.active_index,
-            "open_guides": [{"file_path": g['file'], "id": g['id'], "name": g['name']} for g in self.open_guides]
+            "open_guides": [{"file_path": g['file'], "id": g['id'], "name": g['name'],
+                             "current_idx": g['current_idx']} for g in self.open_guides]
         }
-        self.parser.save_file(self.session_file, session_data)
+        self.writer.schedule(("session",), session_data)
+
+    def flush(self):
+        """Force l'écriture immédiate des sauvegardes en attente."""
+        self.writer.flush()
+
+    def shutdown(self):
+        self.writer.shutdown()
+        self.store.close()
 
     def load_last_session(self):
-        data = self.parser.load_file(self.session_file)
+        data = self.store.load_session()
         if not data: return None, -1
 
         self.last_char_name = data.get("character_name", "")
@@ -0,0 +1,72 @@
+import sys
+import zlib
+
+HTML_COMPRESS_MIN = 512  # Octets UTF-8 ; en dessous, le HTML est gardé en str interné
+HTML_COMPRESS_LEVEL = 1  # Décompressé à chaque rendu : la vitesse prime sur le ratio
+
+
+class Step:
+    """
+    Étape de guide gardée en mémoire : seuls les champs lus par l'application (id, pos_x, pos_y,
+    web_text) sont conservés, au lieu du dict complet exporté par Ganymede.
+    Le HTML long est stocké compressé et décompressé à la lecture ; le HTML court est interné
+    (les textes identiques d'un guide à l'autre partagent un seul objet).
+    Compatible en lecture avec l'ancien dict : step.get("web_text"), step["pos_x"]...
+    """
+
+    __slots__ = ("id", "pos_x", "pos_y", "_html")
+
+    FIELDS = ("id", "pos_x", "pos_y", "web_text")
+
+    def __init__(self, step_id=None, pos_x=None, pos_y=None, web_text=None):
+        self.id = sys.intern(step_id) if isinstance(step_id, str) else step_id
+        self.pos_x = pos_x
+        self.pos_y = pos_y
+        self._html = _pack_html(web_text)
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(data.get("id"), data.get("pos_x"), data.get("pos_y"), data.get("web_text"))
+
+    @property
+    def web_text(self):
+        html = self._html
+        return zlib.decompress(html).decode("utf-8") if isinstance(html, bytes) else html
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and getattr(self, key) is not None
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.FIELDS if getattr(self, key) is not None}
+
+    def __repr__(self):
+        return f"Step(id={self.id!r}, pos=({self.pos_x!r}, {self.pos_y!r}))"
+
+
+def _pack_html(html):
+    if not html:
+        return html
+    raw = html.encode("utf-8")
+    if len(raw) < HTML_COMPRESS_MIN:
+        return sys.intern(html)
+    packed = zlib.compress(raw, HTML_COMPRESS_LEVEL)
+    # HTML peu compressible (rare) : la chaîne telle quelle coûte moins cher
+    return packed if len(packed) < len(html) else html
+
+
+def compact_steps(steps):
+    """Étapes compactes à partir des dicts JSON d'un guide (mêmes index : un élément invalide est gardé tel quel)."""
+    return [Step.from_dict(step) if isinstance(step, dict) else step for step in steps]
@@ -0,0 +1,208 @@
+import os
+import json
+import mmap
+import struct
+import shutil
+import hashlib
+import logging
+import tempfile
+from collections.abc import Sequence
+
+from scripts.guide_compiler import GuideCompiler, StepAction
+from scripts.step_model import Step
+from scripts.json_stream import iter_guide_events, iter_file_chunks
+
+logger = logging.getLogger(__name__)
+
+# --- FORMAT BINAIRE (.steps) ---
+# En-tête | méta JSON du guide | table d'offsets | [action, étape] * N
+# Les offsets (uint64) sont absolus : l'enregistrement i occupe [off[i], off[i+1]).
+MAGIC = b"DTSS"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxqqII20s")  # magic, version, mtime_ns, taille, nb étapes, taille méta, sha1
+OFFSET = struct.Struct("<Q")
+STORE_EXT = ".steps"
+
+
+def store_path_for(json_path):
+    # guides/123.json et guides/123.json.gz partagent le même store
+    if json_path.endswith(".gz"):
+        json_path = json_path[:-3]
+    return os.path.splitext(json_path)[0] + STORE_EXT
+
+
+def _dump(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class StepStore:
+    """
+    Lecture d'un guide compilé via mmap : seuls l'en-tête et la méta sont lus à l'ouverture,
+    chaque étape n'est décodée qu'au moment où on y accède.
+    """
+
+    def __init__(self, bin_path):
+        self.path = bin_path
+        self._file = open(bin_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.src_mtime_ns, self.src_size, self.count, meta_len, self.src_hash = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Format de store invalide : {bin_path}")
+        meta_start = HEADER.size
+        self.meta = json.loads(self._mm[meta_start:meta_start + meta_len].decode('utf-8'))
+        self._table_start = meta_start + meta_len
+
+    def records(self):
+        """
+        Étapes paresseuses, avec la table d'actions en .actions (add_guide n'a rien à recompiler).
+        Le store ne les référence pas en retour : libérées, elles ferment mmap et fichier tout de suite,
+        sans attendre le GC des cycles (sous Windows, un .steps encore projeté ne peut pas être remplacé).
+        """
+        steps = StoredRecords(self, self.read_step)
+        steps.actions = StoredRecords(self, self.read_action)
+        return steps
+
+    def _record(self, k):
+        start = OFFSET.unpack_from(self._mm, self._table_start + k * OFFSET.size)[0]
+        end = OFFSET.unpack_from(self._mm, self._table_start + (k + 1) * OFFSET.size)[0]
+        return json.loads(self._mm[start:end].decode('utf-8'))
+
+    def read_action(self, index):
+        return StepAction(*self._record(2 * index))
+
+    def read_step(self, index):
+        return self._record(2 * index + 1)
+
+    def close(self):
+        try:
+            self._mm.close()
+            self._file.close()
+        except Exception:
+            pass
+
+    # --- CONSTRUCTION ---
+
+    @staticmethod
+    def build(json_path, bin_path, compiler):
+        """
+        Compile le JSON d'un guide vers le format binaire (écriture atomique).
+        Le JSON est décodé étape par étape : la mémoire ne dépend pas de la taille du guide.
+        """
+        st = os.stat(json_path)
+        src_hash = hashlib.sha1()
+        meta, offsets, count = {}, [], 0
+        with tempfile.TemporaryFile() as records:
+            for kind, key, value in iter_guide_events(iter_file_chunks(json_path, src_hash.update)):
+                if kind == "meta":
+                    meta[key] = value
+                    continue
+                for rec in (_dump(list(compiler.safe_compile_step(value))), _dump(value)):
+                    offsets.append(records.tell())
+                    records.write(rec)
+                count += 1
+            offsets.append(records.tell())
+            meta_bytes = _dump(meta)
+
+            table_start = HEADER.size + len(meta_bytes)
+            records_start = table_start + len(offsets) * OFFSET.size
+            tmp_path = bin_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, st.st_mtime_ns, st.st_size, count, len(meta_bytes),
+                                    src_hash.digest()))
+                f.write(meta_bytes)
+                f.write(b"".join(OFFSET.pack(records_start + o) for o in offsets))
+                records.seek(0)
+                shutil.copyfileobj(records, f)
+        os.replace(tmp_path, bin_path)
+
+    @staticmethod
+    def is_fresh(json_path, bin_path):
+        """
+        Vérifie que le store correspond au JSON : mtime/taille d'abord, puis hash si besoin.
+        Si seul le mtime a bougé (contenu identique), l'en-tête est mis à jour en place.
+        """
+        if not os.path.exists(bin_path):
+            return False
+        try:
+            st = os.stat(json_path)
+            with open(bin_path, 'r+b') as f:
+                header = f.read(HEADER.size)
+                magic, version, mtime_ns, size, count, meta_len, src_hash = HEADER.unpack(header)
+                if magic != MAGIC or version != VERSION:
+                    return False
+                if mtime_ns == st.st_mtime_ns and size == st.st_size:
+                    return True
+                with open(json_path, 'rb') as src:
+                    if hashlib.sha1(src.read()).digest() != src_hash:
+                        return False
+                f.seek(0)
+                f.write(HEADER.pack(magic, version, st.st_mtime_ns, st.st_size, count, meta_len, src_hash))
+            return True
+        except Exception as e:
+            logger.warning(f"Store illisible ({bin_path}) : {e}")
+            return False
+
+
+class StoredRecords(Sequence):
+    """Séquence paresseuse adossée au mmap (compatible avec steps[i] / len(steps))."""
+
+    def __init__(self, store, reader):
+        self.store = store
+        self._reader = reader
+
+    def __len__(self):
+        return self.store.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._reader(index)
+
+
+class GrowingSteps(Sequence):
+    """
+    Étapes d'un guide en cours de téléchargement : le guide s'affiche dès la première,
+    les suivantes s'ajoutent au fil du décodage (thread réseau) avec leurs actions.
+    """
+
+    def __init__(self, compiler):
+        self._compiler = compiler
+        self._steps = []
+        self.actions = []  # Reprise telle quelle par GuideCompiler.compile_steps
+
+    def append(self, step):
+        # L'action d'abord : une étape visible a toujours son action
+        self.actions.append(self._compiler.safe_compile_step(step))
+        self._steps.append(Step.from_dict(step))
+
+    def __len__(self):
+        return len(self._steps)
+
+    def __getitem__(self, index):
+        return self._steps[index]
+
+
+def open_guide_store(json_path, parser_script):
+    """
+    Ouvre (et régénère si nécessaire) le store binaire d'un guide.
+    Retourne un dict de même forme que le JSON, avec 'steps' paresseux, ou None en cas d'échec.
+    """
+    bin_path = store_path_for(json_path)
+    try:
+        if not StepStore.is_fresh(json_path, bin_path):
+            StepStore.build(json_path, bin_path, GuideCompiler(parser_script))
+            logger.info(f"📦 Store binaire régénéré : {os.path.basename(bin_path)}")
+        store = StepStore(bin_path)
+    except Exception as e:
+        logger.warning(f"Store binaire indisponible pour {json_path} ({e}), lecture JSON.")
+        return None
+
+    data = dict(store.meta)
+    data["steps"] = store.records()
+    return data
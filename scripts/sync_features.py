@@ -0,0 +1,247 @@
+"""
+Synchronisation de toute la bibliothèque guides/ avec Ganymede.
+
+Usage sans interface (depuis la racine du projet) :
+    python -m scripts.sync_features [--workers N] [--restart] [--folder guides]
+
+Une synchro interrompue (Ctrl+C, fermeture de l'application) reprend au lancement suivant,
+sauf avec --restart.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from scripts.parser_features import guide_stem
+from scripts.http_client import wire_bytes
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANGED = "changed"
+STATUS_UNCHANGED = "unchanged"
+STATUS_FAILED = "failed"
+
+CHECKPOINT_EVERY = 10  # Résultats entre deux écritures du point de reprise
+MAX_RETRY_AFTER = 60  # Secondes, plafond du Retry-After accepté
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After", "")
+    return min(int(value), MAX_RETRY_AFTER) if value.isdigit() else None
+
+
+class LibrarySync:
+    """
+    Revalide chaque guide de la bibliothèque contre /guides/<id>/export.
+
+    - Au plus workers requêtes simultanées, toutes conditionnelles (ETag / Last-Modified du client HTTP).
+    - 429, 5xx et erreurs réseau réessayés avec un backoff exponentiel (Retry-After respecté).
+    - Point de reprise sur disque : les guides déjà traités ne sont pas redemandés après une interruption
+      (ceux en échec le sont : ils ne sont jamais enregistrés comme traités).
+    - Rapport par guide : {id: {"status": changed|unchanged|failed, "bytes": octets transférés, "error"}}.
+    on_result(id, statut, octets) et on_changed(data, chemin) sont appelés depuis les threads de la synchro.
+    """
+
+    def __init__(self, network, parser_script, folder="guides",
+                 checkpoint_path=os.path.join("saves", "library_sync.json"),
+                 workers=4, retries=3, backoff=1.0, timeout=10, on_result=None, on_changed=None):
+        self.network = network
+        self.http = network.http
+        self.parser = parser_script
+        self.folder = folder
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.on_result = on_result
+        self.on_changed = on_changed
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self.running = False
+
+    def library_ids(self):
+        """IDs des guides de la bibliothèque (fichiers <id>.json.gz ou ancien <id>.json)."""
+        stems = (guide_stem(path) for path in self.parser.list_library(self.folder))
+        return sorted((stem for stem in stems if stem.isdigit()), key=int)
+
+    def run(self, resume=True):
+        """Synchronise la bibliothèque (bloquant). Retourne le rapport, ou None si une synchro est déjà en cours."""
+        with self._lock:
+            if self.running:
+                logger.warning("Synchro de la bibliothèque déjà en cours.")
+                return None
+            self.running = True
+        self._cancelled.clear()
+        try:
+            return self._run(resume)
+        finally:
+            self.running = False
+
+    def cancel(self):
+        """Interrompt la synchro en cours ; le point de reprise est conservé."""
+        self._cancelled.set()
+
+    # --- INTERNE ---
+    def _run(self, resume):
+        report = self._load_checkpoint() if resume else {}
+        todo = [gid for gid in self.library_ids() if gid not in report]
+        if report:
+            logger.info(f"🔄 Reprise de la synchro : {len(report)} guide(s) déjà traité(s), {len(todo)} restant(s).")
+        else:
+            logger.info(f"🔄 Synchro de la bibliothèque : {len(todo)} guide(s)...")
+
+        started = time.monotonic()
+        unsaved = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="LibrarySync") as pool:
+                futures = {pool.submit(self._sync_guide, gid): gid for gid in todo}
+                try:
+                    for future in as_completed(futures):
+                        result = future.result()
+                        if result is None:
+                            continue  # Annulé avant la requête
+                        gid = futures[future]
+                        report[gid] = result
+                        unsaved += 1
+                        if unsaved >= CHECKPOINT_EVERY:
+                            self._save_checkpoint(report)
+                            unsaved = 0
+                        if self.on_result:
+                            self.on_result(gid, result["status"], result["bytes"])
+                except BaseException:
+                    self._cancelled.set()  # Les jobs pas encore lancés s'arrêtent tout de suite
+                    raise
+        finally:
+            if self._cancelled.is_set():
+                self._save_checkpoint(report)
+                logger.info(f"⏸️ Synchro interrompue : {len(report)} guide(s) traité(s), reprise au prochain lancement.")
+            else:
+                self._clear_checkpoint()
+
+        if not self._cancelled.is_set():
+            counts = {STATUS_CHANGED: 0, STATUS_UNCHANGED: 0, STATUS_FAILED: 0}
+            for result in report.values():
+                counts[result["status"]] += 1
+            total_bytes = sum(result["bytes"] for result in report.values())
+            logger.info(f"✅ Synchro terminée en {time.monotonic() - started:.1f} s : "
+                        f"{counts[STATUS_CHANGED]} modifié(s), {counts[STATUS_UNCHANGED]} inchangé(s), "
+                        f"{counts[STATUS_FAILED]} échec(s), {total_bytes // 1024} Ko reçus")
+        return report
+
+    def _sync_guide(self, gid):
+        """Résultat d'un guide, ou None si la synchro a été annulée avant."""
+        url = self.network.guide_url(gid)
+        received, error, data = 0, None, None
+        for attempt in range(1, self.retries + 2):
+            if self._cancelled.is_set():
+                return None
+            delay = None
+            try:
+                response = self.http.get(url, timeout=self.timeout, revalidate=True)
+                received += wire_bytes(response)  # Octets transférés, pas la taille décodée
+                if response.status_code == 304:
+                    return {"status": STATUS_UNCHANGED, "bytes": received, "error": None}
+                response.raise_for_status()
+                data = response.json()
+                break
+            except requests.HTTPError as e:
+                code = e.response.status_code
+                retry, error = code == 429 or code >= 500, f"HTTP {code}"
+                delay = _retry_after(e.response)
+            except ValueError:
+                # Avant RequestException : le JSONDecodeError de requests hérite des deux
+                retry, error = False, "réponse invalide (pas du JSON)"
+                self.http.forget(url)  # ETag du 200 déjà enregistré : il validerait la copie locale
+            except requests.RequestException as e:
+                retry, error = True, str(e)
+            if not retry or attempt > self.retries:
+                break
+            self._cancelled.wait(delay if delay is not None else self.backoff * 2 ** (attempt - 1))
+
+        if data is None:
+            logger.warning(f"Synchro : guide {gid} en échec ({error})")
+            return {"status": STATUS_FAILED, "bytes": received, "error": error}
+        return self._apply(gid, data, received)
+
+    def _apply(self, gid, data, received):
+        """Archive une réponse 200 si son contenu diffère de la copie locale."""
+        try:
+            # Sans validateur connu, le serveur renvoie 200 même si rien n'a changé
+            local = self.parser.find_in_library(gid, self.folder)
+            if local and data == self.parser.load_file(local):
+                return {"status": STATUS_UNCHANGED, "bytes": received, "error": None}
+            if not self.parser.get_steps_list(data):
+                error = "aucune étape valide"
+            else:
+                path = self.parser.save_guide_to_library(data, self.folder)
+                if path:
+                    logger.info(f"🔄 Guide mis à jour : {data.get('name', gid)}")
+                    if self.on_changed:
+                        self.on_changed(data, path)
+                    return {"status": STATUS_CHANGED, "bytes": received, "error": None}
+                error = "sauvegarde impossible"
+        except Exception as e:
+            error = str(e)
+        # Version non archivée : son ETag (enregistré avec le 200) ne doit pas valider la copie locale
+        self.http.forget(self.network.guide_url(gid))
+        logger.warning(f"Synchro : guide {gid} en échec ({error})")
+        return {"status": STATUS_FAILED, "bytes": received, "error": error}
+
+    def _load_checkpoint(self):
+        data = self.parser.load_file(self.checkpoint_path)
+        results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(results, dict):
+            return {}
+        # Échecs d'un ancien point de reprise : redemandés
+        return {gid: r for gid, r in results.items() if r.get("status") != STATUS_FAILED}
+
+    def _save_checkpoint(self, report):
+        done = {gid: r for gid, r in report.items() if r["status"] != STATUS_FAILED}
+        self.parser.save_file(self.checkpoint_path, {"results": done}, indent=None)
+
+    def _clear_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Point de reprise de la synchro non supprimé : {e}")
+
+
+def main(argv=None):
+    from scripts.parser_features import ParserScripts
+    from scripts.network_features import NetworkFeatures
+    from scripts.search_features import SearchIndex
+
+    arg_parser = argparse.ArgumentParser(description="Synchronise la bibliothèque de guides avec Ganymede.")
+    arg_parser.add_argument("--workers", type=int, default=4, help="requêtes simultanées (défaut : 4)")
+    arg_parser.add_argument("--restart", action="store_true", help="ignore le point de reprise")
+    arg_parser.add_argument("--folder", default="guides", help="dossier de la bibliothèque")
+    args = arg_parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s : %(message)s',
+                        datefmt='%H:%M:%S')
+    parser_script = ParserScripts()
+    search = SearchIndex(os.path.join("saves", "search.db"))
+    parser_script.search_index = search
+    network = NetworkFeatures()
+    sync = LibrarySync(network, parser_script, folder=args.folder, workers=args.workers,
+                       on_result=lambda gid, status, size: print(f"{gid}\t{status}\t{size}"))
+    try:
+        report = sync.run(resume=not args.restart)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        network.http.close()
+        search.close()
+    return 1 if any(r["status"] == STATUS_FAILED for r in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
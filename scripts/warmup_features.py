@@ -0,0 +1,98 @@
+import os
+import re
+import threading
+import logging
+from scripts.download_features import PRIORITY_WARMUP
+
+logger = logging.getLogger(__name__)
+
+IMG_SRC_URL = re.compile(r'<img[^>]*?\ssrc="(https?://[^"]+)"', re.IGNORECASE)
+IMAGEURL_ATTR = re.compile(r'\simageurl="(https?://[^"]+)"', re.IGNORECASE)
+
+
+def extract_image_urls(htmls):
+    """URLs distinctes des <img src> et des spans imageurl, dans l'ordre d'apparition."""
+    urls = {}
+    for html in htmls:
+        if 'src="' in html or 'imageurl="' in html:
+            for url in IMG_SRC_URL.findall(html):
+                urls[url] = None
+            for url in IMAGEURL_ATTR.findall(html):
+                urls[url] = None
+    return list(urls)
+
+
+class AssetWarmup:
+    """
+    Remplit le cache d'images en tâche de fond (priorité basse) pour un guide entier
+    ou pour toute la bibliothèque, afin de pouvoir jouer hors-ligne.
+    on_progress(fait, total) est appelé depuis les threads de téléchargement.
+    """
+
+    def __init__(self, downloads, assets, on_progress=None):
+        self.downloads = downloads
+        self.assets = assets
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+        self._tasks = {}  # clé du guide -> {"name", "pending": set(url), "total", "failed"}
+
+    def warm_guide(self, key, name, htmls):
+        """Programme les images absentes du cache. Retourne le nombre de téléchargements demandés."""
+        urls = [url for url in extract_image_urls(htmls) if not self.assets.contains(url)]
+        if not urls:
+            return 0
+        with self._lock:
+            task = self._tasks.setdefault(key, {"name": name, "pending": set(), "total": 0, "failed": 0})
+            new = [url for url in urls if url not in task["pending"]]
+            task["pending"].update(new)
+            task["total"] += len(new)
+        for url in new:
+            self.downloads.submit(url, self.assets.store, PRIORITY_WARMUP, group=("warmup", key),
+                                  callback=lambda u, ok, k=key: self._on_downloaded(k, u, ok))
+        self._report()
+        return len(new)
+
+    def warm_library(self, parser_script, folder="guides"):
+        """Tous les guides de la bibliothèque (à lancer hors du thread UI)."""
+        requested = 0
+        for path in parser_script.list_library(folder):
+            data = parser_script.load_file(path)
+            if data:
+                steps = parser_script.get_steps_list(data)
+                htmls = [parser_script.get_step_web_text(step) for step in steps]
+                requested += self.warm_guide(path, data.get("name", os.path.basename(path)), htmls)
+        logger.info(f"🖼️ Bibliothèque : {requested} image(s) à mettre en cache pour le hors-ligne.")
+        return requested
+
+    def cancel(self, key):
+        """Abandonne le préchargement d'un guide (ex : onglet fermé)."""
+        self.downloads.cancel_group(("warmup", key))
+        with self._lock:
+            self._tasks.pop(key, None)
+        self._report()
+
+    def progress(self):
+        """(fait, total) cumulés sur les préchargements en cours."""
+        with self._lock:
+            total = sum(t["total"] for t in self._tasks.values())
+            pending = sum(len(t["pending"]) for t in self._tasks.values())
+        return total - pending, total
+
+    def _on_downloaded(self, key, url, ok):
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None or url not in task["pending"]:
+                return
+            task["pending"].discard(url)
+            task["failed"] += not ok
+            finished = not task["pending"]
+            if finished:
+                del self._tasks[key]
+        if finished:
+            logger.info(f"🖼️ Images de « {task['name']} » en cache "
+                        f"({task['total'] - task['failed']}/{task['total']}).")
+        self._report()
+
+    def _report(self):
+        if self.on_progress:
+            self.on_progress(*self.progress())
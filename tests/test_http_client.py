@@ -0,0 +1,224 @@
+"""
+Tests du client HTTP partagé contre un serveur local (http.server sur 127.0.0.1).
+
+Lancement (depuis la racine du projet) :
+    python -m pytest -q tests
+"""
+import gzip
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from scripts import network_features
+from scripts.http_client import HttpClient
+from scripts.network_features import NetworkFeatures
+from scripts.download_features import DownloadScheduler
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Sat, 17 Oct 2026 10:00:00 GMT"
+GUIDE = {"id": 42, "name": "Guide test", "steps": [{"id": 1, "web_text": "<p>Étape</p>"}]}
+
+
+class StandInServer:
+    """Serveur local : routes {chemin: fonction(handler) -> (statut, en-têtes, corps)}, requêtes reçues notées."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []  # (chemin, en-têtes)
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append((self.path, dict(self.headers)))
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    status, headers, body = server.routes[self.path](self)
+                finally:
+                    with server._lock:
+                        server.active -= 1
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if "Content-Length" not in headers:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def conditional_guide(handler):
+    """Export de guide avec validateurs : 304 si le client renvoie l'ETag ou la date connue."""
+    if handler.headers.get("If-None-Match") == ETAG or handler.headers.get("If-Modified-Since") == LAST_MODIFIED:
+        return 304, {"ETag": ETAG}, b""
+    body = json.dumps(GUIDE).encode("utf-8")
+    return 200, {"Content-Type": "application/json", "ETag": ETAG, "Last-Modified": LAST_MODIFIED}, body
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def http(tmp_path):
+    client = HttpClient(db_path=str(tmp_path / "http.db"))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def network(server, http, monkeypatch):
+    monkeypatch.setattr(network_features, "shared_http_client", lambda: http)
+    net = NetworkFeatures()
+    net.base_url = server.url
+    server.routes["/guides/42/export"] = conditional_guide
+    return net
+
+
+# --- REVALIDATION ---
+
+def test_revalidation_sends_stored_validators(server, http):
+    server.routes["/guide"] = conditional_guide
+    url = server.url + "/guide"
+
+    first = http.get(url, revalidate=True)
+    assert first.status_code == 200
+    assert "If-None-Match" not in server.requests[0][1]
+
+    second = http.get(url, revalidate=True)
+    assert second.status_code == 304
+    headers = server.requests[1][1]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+    assert http.stats()["not_modified"] == 1
+
+
+def test_validators_survive_a_new_client(server, http, tmp_path):
+    server.routes["/guide"] = conditional_guide
+    url = server.url + "/guide"
+    http.get(url, revalidate=True)
+
+    reopened = HttpClient(db_path=str(tmp_path / "http.db"))
+    try:
+        assert reopened.get(url, revalidate=True).status_code == 304
+    finally:
+        reopened.close()
+
+
+def test_forget_drops_validators(server, http):
+    server.routes["/guide"] = conditional_guide
+    url = server.url + "/guide"
+    http.get(url, revalidate=True)
+    http.forget(url)
+    assert http.get(url, revalidate=True).status_code == 200
+
+
+def test_fetch_guide_data_returns_cached_copy_on_304(network):
+    stale = {"id": 42, "name": "Ancienne version", "steps": []}
+    data, err = network.fetch_guide_data(42, cached=stale)
+    assert err is None and data == GUIDE  # 200 : validateurs enregistrés
+
+    again, err = network.fetch_guide_data(42, cached=data)
+    assert err is None
+    assert again is data
+
+
+def test_fetch_guide_data_without_cache_downloads_in_full(network, server):
+    network.fetch_guide_data(42)
+    data, err = network.fetch_guide_data(42)
+    assert err is None and data == GUIDE
+    assert "If-None-Match" not in server.requests[-1][1]
+
+
+# --- COMPRESSION ---
+
+def test_gzip_body_is_decoded(server, http):
+    raw = json.dumps(GUIDE).encode("utf-8") * 50
+    packed = gzip.compress(raw)
+    server.routes["/gz"] = lambda h: (200, {"Content-Encoding": "gzip"}, packed)
+
+    response = http.get(server.url + "/gz")
+    assert "gzip" in server.requests[0][1]["Accept-Encoding"]
+    assert response.content == raw
+    # Octets transférés : le corps compressé, pas la taille décodée
+    assert http.stats()["bytes"] == len(packed)
+
+
+def run_download(http, url):
+    """Télécharge url via l'ordonnanceur ; retourne (données, taille annoncée) reçues par store."""
+    received = {}
+    done = threading.Event()
+    scheduler = DownloadScheduler(workers=1, retries=0, http=http)
+    try:
+        scheduler.submit(url, lambda u, data, expected: received.update(data=data, expected=expected),
+                         callback=lambda u, ok: done.set())
+        assert done.wait(5)
+    finally:
+        scheduler.shutdown()
+    return received["data"], received["expected"]
+
+
+def test_compressed_image_skips_content_length_check(server, http):
+    image = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+    packed = gzip.compress(image)
+    server.routes["/img.png"] = lambda h: (200, {"Content-Encoding": "gzip"}, packed)
+
+    data, expected = run_download(http, server.url + "/img.png")
+    assert data == image
+    # Content-Length compte les octets compressés : il ne doit pas servir de taille attendue
+    assert expected is None
+
+
+def test_plain_image_keeps_content_length_check(server, http):
+    image = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+    server.routes["/img.png"] = lambda h: (200, {}, image)
+
+    data, expected = run_download(http, server.url + "/img.png")
+    assert data == image
+    assert expected == len(image)
+
+
+# --- CONCURRENCE ---
+
+def test_concurrency_cap_is_shared_by_all_callers(server, tmp_path):
+    def slow(handler):
+        time.sleep(0.2)
+        return 200, {}, b"ok"
+
+    server.routes["/slow"] = slow
+    client = HttpClient(db_path=str(tmp_path / "cap.db"), max_concurrency=2)
+    try:
+        threads = [threading.Thread(target=client.get, args=(server.url + "/slow",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+    finally:
+        client.close()
+
+    assert len(server.requests) == 6
+    assert server.max_active == 2